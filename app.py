@@ -1,17 +1,38 @@
+import io
+import time
+from collections import deque
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from streamlit_gsheets import GSheetsConnection
-import requests
-import base64
-import os
-import re
-from fpdf import FPDF
+from schema import DATE_COLS, CATEGORY_COLS, CATEGORIES, ID_COL, VERSION_COL, has_ids, changed_values
+from job_store import JobStore
+from job_cards import create_job_card, export_job_cards
+from job_io import read_table, map_columns, validate, export_csv
+from uploads import upload_files
+from attachments import prepare_files, AttachmentIndex
+from write_queue import WriteQueue
+import kpis
+import tracing
+from tracing import span
 
 # --- CONFIGURATION ---
 APPS_SCRIPT_URL = "https://script.google.com/macros/s/AKfycbwdoNiRHqoUn5sI6eWVDL7oKvK_6WUSAEnM7Ua-xFkJYhrDwKsDos8gJJb6ZEyXKiR5/exec" 
 ONEDRIVE_URL = "https://uelcoservices-my.sharepoint.com/personal/sonelle_uelco_co_za/_layouts/15/onedrive.aspx?id=%2Fpersonal%2Fsonelle%5Fuelco%5Fco%5Fza%2FDocuments%2FUelco%20APP%20testing&viewid=610b061b%2Db513%2D4114%2D8c76%2D59a9d605bddf&ga=1"
-
+SYNC_MODE = "delta"  # "delta" patches only inserted/changed/deleted rows, "full" rewrites the whole worksheet
+QUEUE_DB = "pending_writes.db"  # local write-ahead journal, survives restarts and dropped connections
+PAGE_SIZE = 50  # rows per data-editor page
+ARCHIVE_WORKSHEET = "Archive"  # closed jobs move here and stop loading on startup; None disables archiving
+ARCHIVE_AFTER_DAYS = 180  # a job is closed once Completed and Invoiced, and archived when its latest date is this old
+IMAGE_MAX_SIDE = 1600  # photos are shrunk to fit this many pixels before upload; None uploads them full size
+IMAGE_QUALITY = 80  # JPEG quality photos are recompressed at
+THUMB_SIDE = 96  # size of the table preview thumbnails
+ATTACHMENTS_DB = "attachments.db"  # content hash -> Drive link and thumbnail of every uploaded file
+TRACE_LOG = "trace.log"  # every timing span as a JSON line, rotated at 5 MB; None disables the log
+TRACE_RUNS = 20  # reruns the sidebar's performance panel keeps per session
+
+RUN_START = time.perf_counter()
 st.set_page_config(page_title="UELCO-MANAGER", layout="wide")
 
 # --- CSS ---
@@ -31,53 +52,41 @@ st.markdown("""
 
 # --- HELPER FUNCTIONS ---
 
-def clean_phone_for_whatsapp(phone):
-    if not phone: return None
-    digits = re.sub(r'\D', '', str(phone))
-    if digits.startswith('0'): digits = '27' + digits[1:]
-    return f"https://wa.me/{digits}"
-
-def create_job_card(data):
-    pdf = FPDF()
-    pdf.add_page()
-    if os.path.exists("template.jpg"):
-        try:
-            pdf.image("template.jpg", x=0, y=0, w=210) 
-            pdf.set_y(50) 
-        except:
-            pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "UELCO SERVICES", ln=True, align='C')
-    else:
-        pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "UELCO SERVICES - JOB CARD", ln=True, align='C'); pdf.ln(10)
-
-    pdf.set_font("Arial", 'B', 12); pdf.set_fill_color(230, 230, 230); pdf.cell(0, 8, "  JOB CARD DETAILS", ln=True, fill=True); pdf.ln(5)
-    pdf.set_font("Arial", size=10)
-    
-    def clean(text): return str(text).encode('latin-1', 'replace').decode('latin-1')
-
-    fields = [("Ref", "Category"), ("Client", "Client_Name"), ("Contact", "Client_Contact"), ("Service", "Service_Type"), ("Date", "Date"), ("Date Recv", "Date_Received"), ("Tech", "Technician"), ("Loc", "Location"), ("Quote", "Quote_Amount")]
-    for label, key in fields:
-        val = data.get(key, "")
-        if val and str(val).strip() != "" and str(val) != "NaT":
-            pdf.set_font("Arial", 'B', 10); pdf.cell(40, 7, f"{label}:", border=0)
-            pdf.set_font("Arial", size=10); pdf.cell(0, 7, clean(val), border=0, ln=1)
-
-    if data.get("Notes"):
-        pdf.ln(5); pdf.set_font("Arial", 'B', 10); pdf.cell(0, 8, "Notes:", ln=True, fill=True)
-        pdf.set_font("Arial", size=10); pdf.multi_cell(0, 6, clean(data.get("Notes")), border=0)
-
-    if pdf.get_y() < 220: pdf.set_y(220)
-    pdf.ln(5); pdf.set_font("Arial", 'B', 10)
-    pdf.cell(80, 5, "Technician Signature", 0, 0); pdf.cell(30, 5, ""); pdf.cell(80, 5, "Client Signature", 0, 1)
-    pdf.ln(10); pdf.cell(80, 0, "", "B"); pdf.cell(30, 0, ""); pdf.cell(80, 0, "", "B", 1)
-    return pdf.output(dest='S').encode('latin-1')
-
-def upload_to_drive(file_obj, filename):
-    if "script.google.com" not in APPS_SCRIPT_URL: return None
-    try:
-        data = base64.b64encode(file_obj.getvalue()).decode('utf-8')
-        resp = requests.post(APPS_SCRIPT_URL, data={'filename': filename, 'mimetype': file_obj.type, 'data': data})
-        return resp.json().get('link') if resp.status_code == 200 and resp.json().get('result') == 'success' else None
-    except: return None
+def upload_attachments(files, prefix):
+    """Uploads the picked files concurrently behind a progress bar; returns their links, space separated.
+    Photos are shrunk first, and a file uploaded before (same content) reuses its link instead of going up again."""
+    if not files: return ""
+    bar = st.progress(0.0, "Preparing...")
+    with span("attachments.prepare", rows=len(files), bytes=sum(f.size for f in files)) as trace:
+        prepared = prepare_files(files, prefix, max_side=IMAGE_MAX_SIDE, quality=IMAGE_QUALITY, thumb_side=THUMB_SIDE)
+        trace["out_bytes"] = sum(a.size for a in prepared)
+    index = get_attachments()
+    links = index.links(a.digest for a in prepared)
+    new = list({a.digest: a for a in prepared if a.digest not in links}.values())
+    if new:
+        sent = upload_files(APPS_SCRIPT_URL, new, [a.name for a in new], progress=lambda sent, total: bar.progress(sent / total if total else 1.0, f"Uploading {sent // 1024:,} / {total // 1024:,} KB"))
+        index.add(new, sent)
+        links.update({a.digest: link for a, link in zip(new, sent) if link})
+        if None in sent: st.warning(f"{sent.count(None)} of {len(files)} file(s) failed to upload.")
+    bar.empty()
+    reused = len({a.digest for a in prepared}) - len(new)
+    if reused: st.toast(f"{reused} file{'s were' if reused != 1 else ' was'} uploaded before - linked, not uploaded again", icon="♻️")
+    return " ".join(dict.fromkeys(links[a.digest] for a in prepared if a.digest in links))
+
+def first_link(links):
+    """Photo_Link may hold several space-separated links; tables open the first."""
+    return links.str.split().str[0]
+
+def paginate(df, key):
+    """Slices `df` to the page picked under `key` and returns (page_df, page); the picker only shows when there is more than one page."""
+    pages = max(1, -(-len(df) // PAGE_SIZE))
+    if st.session_state.get(key, 1) > pages: st.session_state[key] = pages  # filter or delete shrank the table
+    page = 1
+    if pages > 1:
+        c1, c2 = st.columns([1, 5])
+        page = c1.number_input("Page", min_value=1, max_value=pages, step=1, key=key, label_visibility="collapsed")
+        c2.caption(f"Page {page} of {pages} - rows {(page - 1) * PAGE_SIZE + 1}-{min(page * PAGE_SIZE, len(df))} of {len(df)}")
+    return df.iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE], page
 
 def parse_date_safe(date_val):
     if pd.isnull(date_val) or date_val == "": return None
@@ -86,62 +95,128 @@ def parse_date_safe(date_val):
 
 # --- CORE DATA LOGIC ---
 
-def load_data():
-    """Fetches data from Google Sheets."""
+# Search fields for `field:value` queries (any prefix of the name works, e.g. tech:john)
+SEARCH_FIELDS = {"client": ["Client_Name"], "contact": ["Client_Contact"], "location": ["Location"], "place": ["Place_Received"], "service": ["Service_Type"], "tech": ["Technician"], "notes": ["Notes"], "quote": ["Quote_Amount"], "date": DATE_COLS}
+
+def load_data(force=True, check=False):
+    """(Re)reads the sheet into the shared store (with force=False only if nothing is loaded yet, or with check=True
+    if the sheet changed since our last read or write), then archives old closed jobs."""
     try:
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        df = conn.read(worksheet="Sheet1", ttl=0).dropna(how='all')
-        
-        # Self-Repair: Ensure columns exist
-        expected_cols = ["Date", "Date_Received", "Date_Sent_To_PT", "Date_Back_From_PT", "Date_Client_Pickup", "Completed", "Invoiced", "Client_Name", "Client_Contact", "Service_Type", "Notes", "Location", "Place_Received", "Quote_Amount", "Technician", "Category", "Photo_Link", "OneDrive_Link"]
-        for col in expected_cols:
-            if col not in df.columns: df[col] = pd.NA
-
-        # Normalize Dates
-        for c in ["Date", "Date_Received", "Date_Sent_To_PT", "Date_Back_From_PT", "Date_Client_Pickup"]:
-            df[c] = pd.to_datetime(df[c], errors='coerce')
-        # Normalize Booleans
-        for c in ["Completed", "Invoiced"]:
-            df[c] = df[c].fillna(False).astype(bool)
-        # Normalize Strings
-        for c in expected_cols:
-            if c not in ["Date", "Date_Received", "Date_Sent_To_PT", "Date_Back_From_PT", "Date_Client_Pickup", "Completed", "Invoiced"]:
-                df[c] = df[c].fillna("").astype(str)
-            
-        return df
+        store = get_store()
+        if store.load(force or (check and store.version and store.stale())): archive_old_jobs()
     except Exception as e:
         st.error(f"Connection Error: {e}")
-        return pd.DataFrame()
+
+def archive_old_jobs():
+    if not ARCHIVE_WORKSHEET: return
+    moved = get_store().archive_closed(pd.Timestamp.now().normalize() - pd.Timedelta(days=ARCHIVE_AFTER_DAYS))
+    if moved: st.toast(f"Archived {moved} closed job{'s' if moved != 1 else ''}", icon="🗄️")
+
+@st.cache_resource
+def get_queue():
+    return WriteQueue(QUEUE_DB, st.connection("gsheets", type=GSheetsConnection))
+
+@st.cache_resource
+def setup_tracing():
+    """Timing spans taken during a session's run are kept in its session state (see finish_run()); all go to TRACE_LOG."""
+    if TRACE_LOG: tracing.configure_log(TRACE_LOG)
+    tracing.set_collector(lambda: st.session_state.setdefault("trace", []) if get_script_run_ctx(suppress_warning=True) else None)
+
+@st.cache_resource
+def get_attachments():
+    return AttachmentIndex(ATTACHMENTS_DB)
+
+@st.cache_resource
+def get_store():
+    """The job table shared by all sessions; a session keeps only its unsaved changes (see pending_changes())."""
+    return JobStore(st.connection("gsheets", type=GSheetsConnection), get_queue(), sync_mode=SYNC_MODE, search_fields=SEARCH_FIELDS, archive_worksheet=ARCHIVE_WORKSHEET)
+
+def jobs():
+    """This session's view of the job table (read-only: changes go through edit_job/delete_job/append_job)."""
+    return get_store().df
+
+def pending_changes():
+    return st.session_state.setdefault("pending", {"edits": {}, "deleted": set(), "added": [], "bulk": []})
+
+def edit_job(label, values):
+    pending_changes()["edits"].setdefault(label, {}).update(values)
+
+def delete_job(label):
+    pending_changes()["deleted"].add(label)
+
+def edit_jobs(labels, values):
+    """Stages the same change for many rows; it is applied as one assignment per column and saved as one write."""
+    pending_changes()["bulk"].append((list(labels), values))
+
+def delete_jobs(labels):
+    pending_changes()["deleted"].update(labels)
+
+def append_job(row):
+    pending_changes()["added"].append(row)
+
+def append_jobs(rows):
+    pending_changes()["added"].extend(rows)
 
 def sync_data(force_reload=False):
-    """Writes the current Local State to Google Sheets, then reloads."""
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = st.session_state["master_df"]
-    
-    # Convert Dates to String for Storage
-    save_df = df.copy()
-    for col in save_df.select_dtypes(include=['datetime64']).columns:
-        save_df[col] = save_df[col].dt.strftime('%Y-%m-%d').replace("NaT", "")
+    """Hands this session's changes to the shared store, which journals them for the background writer and returns immediately."""
+    changes = st.session_state.pop("pending", None)
+    if changes:
+        get_store().commit(changes["edits"], changes["deleted"], changes["added"], changes["bulk"])
 
-    conn.update(worksheet="Sheet1", data=save_df)
-    st.cache_data.clear()
-    
     if force_reload:
-        st.session_state["master_df"] = load_data()
-        st.session_state["unsaved_changes"] = False
-        st.toast("Saved & Synced!", icon="✅")
+        st.toast("Saved - syncing in the background", icon="✅")
         st.rerun()
 
+def editor_key(name):
+    """Data-editor key, renewed after each of this session's edits and whenever the shared table changes."""
+    return f"{name}_{st.session_state.get('editor_epoch', 0)}_{get_store().version}"
+
+def apply_editor_delta(key, labels, data_cols):
+    """on_change for the data editors: stages only the cells the user touched (the editor's edited_rows)
+    and saves them, and handles the Select (edit form) and Bulk (multi-select) tick boxes."""
+    touched = False
+    edited = st.session_state[key].get("edited_rows", {})
+    with span("editor.diff", rows=len(edited)):
+        for pos, changes in edited.items():
+            label = labels[pos]
+            if "Select" in changes:
+                if changes["Select"]: st.session_state["selected_idx"] = label
+                elif st.session_state["selected_idx"] == label: st.session_state["selected_idx"] = None
+            if "Bulk" in changes:
+                bulk = st.session_state.setdefault("bulk_selected", set())
+                if changes["Bulk"]: bulk.add(label)
+                else: bulk.discard(label)
+            values = {col: val for col, val in changes.items() if col in data_cols}
+            if values:
+                edit_job(label, values)
+                touched = True
+    # Fresh editor keys, so the applied edits are not replayed onto rows that moved
+    st.session_state["editor_epoch"] = st.session_state.get("editor_epoch", 0) + 1
+    if touched: sync_data()
+
+def refresh_data():
+    """Flushes pending writes now, or re-reads the sheet (for every session) if it changed elsewhere."""
+    try:
+        if get_store().refresh(): archive_old_jobs()
+    except Exception as e:
+        st.error(f"Connection Error: {e}")
+        return
+    st.rerun()
+
 # --- INITIALIZATION ---
-if "master_df" not in st.session_state:
-    st.session_state["master_df"] = load_data()
-    st.session_state["unsaved_changes"] = False
+# The first session of the process reads the sheet; later ones share it. A new session's first run checks the
+# sheet's change stamp (edits by hand, the CLI or another deployment), and once the writer finds the sheet changed
+# by someone else the next run re-reads it too, merging their changes with ours.
+setup_tracing()
+new_session = "stamp_checked" not in st.session_state
+st.session_state["stamp_checked"] = True
+load_data(force=get_queue().remote_changed, check=new_session)
 
 if "selected_idx" not in st.session_state:
     st.session_state["selected_idx"] = None
 
 def render_category_tab(category_name, sub_services=None):
-    df = st.session_state["master_df"]
+    df = jobs()
     
     if "Category" not in df.columns: return
     category_df = df[df["Category"] == category_name]
@@ -170,38 +245,35 @@ def render_category_tab(category_name, sub_services=None):
             input_data["Service_Type"] = st.selectbox("Work Required", sub_services or [category_name], index=None)
             input_data["Notes"] = st.text_area("Notes")
             input_data["OneDrive_Link"] = st.text_input("OneDrive Link")
-            up_file = st.file_uploader("Upload File")
+            up_files = st.file_uploader("Upload Files", accept_multiple_files=True)
             input_data["Completed"] = False; input_data["Invoiced"] = False
 
             if st.form_submit_button("💾 Save New Job"):
-                if up_file:
-                    ext = up_file.name.split('.')[-1]
-                    link = upload_to_drive(up_file, f"{category_name}_{datetime.now().strftime('%M%S')}.{ext}")
-                    input_data["Photo_Link"] = link or ""
+                input_data["Photo_Link"] = upload_attachments(up_files, category_name)
                 
                 # Append to Local & Sync
-                new_row = pd.DataFrame([input_data])
-                st.session_state["master_df"] = pd.concat([st.session_state["master_df"], new_row], ignore_index=True)
+                append_job(input_data)
                 with st.spinner("Saving..."):
                     sync_data(force_reload=True)
 
     # --- SEARCH ---
     st.divider()
-    search = st.text_input(f"🔍 Search {category_name}", key=f"s_{category_name}")
+    search = st.text_input(f"🔍 Search {category_name}", key=f"s_{category_name}", placeholder="e.g. eskom 082  or  client:eskom tech:john")
     if not category_df.empty and search:
-        mask = category_df.astype(str).apply(lambda x: x.str.contains(search, case=False)).any(axis=1)
-        category_df = category_df[mask]
+        category_df = category_df[has_ids(category_df.index, get_store().search(search))]
 
     # --- TABLE CONFIG ---
     if category_name == "Transformer Servicing":
-        cols_order = ["Date_Received", "Client_Name", "Client_Contact", "Place_Received", "Service_Type", "Notes", "Quote_Amount", "Date_Sent_To_PT", "Date_Back_From_PT", "Date_Client_Pickup", "WA_Link", "Photo_Link", "OneDrive_Link", "Completed", "Invoiced"]
+        cols_order = ["Date_Received", "Client_Name", "Client_Contact", "Place_Received", "Service_Type", "Notes", "Quote_Amount", "Date_Sent_To_PT", "Date_Back_From_PT", "Date_Client_Pickup", "WA_Link", "Preview", "Photo_Link", "OneDrive_Link", "Completed", "Invoiced"]
     else:
         # Sales & Faults (No Technician Summary)
-        cols_order = ["Date", "Client_Name", "Client_Contact", "Location", "Service_Type", "Notes", "WA_Link", "Photo_Link", "OneDrive_Link", "Completed", "Invoiced"]
+        cols_order = ["Date", "Client_Name", "Client_Contact", "Location", "Service_Type", "Notes", "WA_Link", "Preview", "Photo_Link", "OneDrive_Link", "Completed", "Invoiced"]
     
     col_config = {
         "Select": st.column_config.CheckboxColumn("Edit", width="small", default=False),
+        "Bulk": st.column_config.CheckboxColumn("Pick", width="small", default=False, help="Select for bulk actions"),
         "WA_Link": st.column_config.LinkColumn("Chat", display_text="WhatsApp"),
+        "Preview": st.column_config.ImageColumn("Preview", width="small"),
         "Photo_Link": st.column_config.LinkColumn("File", display_text="Open"),
         "OneDrive_Link": st.column_config.LinkColumn("Drive", width="medium"),
         "Completed": st.column_config.CheckboxColumn("Done"),
@@ -221,56 +293,103 @@ def render_category_tab(category_name, sub_services=None):
         if sub_df.empty:
             st.info(f"No {title} found."); return
         
-        st.subheader(title)
+        c_t, c_b = st.columns([4, 1])
+        c_t.subheader(title)
+        if c_b.button(f"☑ Pick All {len(sub_df)}", key=f"pick_all_{category_name}_{key_suf}", help="Select every row of this table (all pages) for bulk actions"):
+            st.session_state.setdefault("bulk_selected", set()).update(sub_df.index)
+            st.session_state["editor_epoch"] = st.session_state.get("editor_epoch", 0) + 1
+        sub_df, page = paginate(sub_df, f"page_{category_name}_{key_suf}")
         
-        # Prepare View
-        df_show = sub_df.copy()
-        df_show.insert(0, "Select", False)
-        if st.session_state["selected_idx"] in df_show.index:
-            df_show.at[st.session_state["selected_idx"], "Select"] = True
-
-        if "Client_Contact" in df_show.columns:
-            df_show["WA_Link"] = df_show["Client_Contact"].apply(clean_phone_for_whatsapp)
-
-        final_cols = ["Select"] + [c for c in cols_order if c in df_show.columns]
+        # Prepare View (shown columns and current page only)
+        df_show = sub_df.reindex(columns=[c for c in cols_order if c in sub_df.columns])
+        df_show.insert(0, "Select", df_show.index == st.session_state["selected_idx"])
+        df_show.insert(1, "Bulk", has_ids(df_show.index, st.session_state.get("bulk_selected", ())))
+        # Plain text in the editor, so a new technician or place can be typed rather than picked
+        df_show = df_show.astype({c: str for c in CATEGORY_COLS if c in df_show.columns})
+
+        if "Photo_Link" in df_show.columns:
+            df_show["Photo_Link"] = first_link(df_show["Photo_Link"])
+            df_show["Preview"] = df_show["Photo_Link"].map(get_attachments().thumbnails(df_show["Photo_Link"].dropna()))
+
+        final_cols = ["Select", "Bulk"] + [c for c in cols_order if c in df_show.columns]
         
-        # RENDER EDITOR
-        edited = st.data_editor(
+        # RENDER EDITOR (edits and Select/Bulk ticks are applied by the on_change callback)
+        data_cols = [c for c in final_cols if c not in ["Select", "Bulk", "WA_Link", "Preview", "Photo_Link"]]
+        key = editor_key(f"ed_{category_name}_{key_suf}_{page}")
+        st.data_editor(
             df_show[final_cols], 
             use_container_width=True, 
             hide_index=True,
             column_config=col_config,
-            disabled=["WA_Link", "Photo_Link"],
-            key=f"ed_{category_name}_{key_suf}"
+            disabled=["WA_Link", "Preview", "Photo_Link"],
+            key=key,
+            on_change=apply_editor_delta,
+            args=(key, list(df_show.index), data_cols)
         )
 
-        # UPDATE LOCAL STATE
-        data_cols = [c for c in final_cols if c not in ["Select", "WA_Link", "Photo_Link"]]
-        if not edited[data_cols].astype(str).equals(df_show[data_cols].astype(str)):
-            st.session_state["master_df"].loc[edited.index, data_cols] = edited[data_cols]
-            st.session_state["unsaved_changes"] = True
-            st.rerun()
-
-        # Handle Select
-        sel = edited[edited["Select"] == True]
-        if not sel.empty:
-            if sel.index[0] != st.session_state["selected_idx"]:
-                st.session_state["selected_idx"] = sel.index[0]
-                st.rerun()
-        elif st.session_state["selected_idx"] in edited.index and not edited.at[st.session_state["selected_idx"], "Select"]:
-            st.session_state["selected_idx"] = None
-            st.rerun()
+    def render_archive():
+        store = get_store()
+        with st.spinner("Loading archive..."):
+            arch = store.archive()
+            if "Category" in arch.columns: arch = arch[arch["Category"] == category_name]
+            if not arch.empty and search: arch = arch[has_ids(arch.index, store.search(search, archived=True))]
+        if arch.empty:
+            st.info("No archived jobs found."); return
+
+        st.subheader("🗄️ Archived Jobs")
+        arch, _ = paginate(arch, f"page_{category_name}_arch")
+        df_show = arch.reindex(columns=[c for c in cols_order if c in arch.columns])
+        if "Photo_Link" in df_show.columns:
+            df_show["Photo_Link"] = first_link(df_show["Photo_Link"])
+        st.dataframe(df_show, use_container_width=True, hide_index=True, column_config=col_config)
 
     active = category_df[~category_df["Completed"]]
     old = category_df[category_df["Completed"]]
     render_table(active, "⚡ Current Jobs", "act")
     st.divider()
-    render_table(old, "✅ Old Jobs", "old")
+    # Old jobs are the bulk of the table: only built when asked for, and the archive only read then
+    if st.toggle(f"✅ Show Old Jobs ({len(old)})", key=f"show_old_{category_name}"):
+        render_table(old, "✅ Old Jobs", "old")
+        if ARCHIVE_WORKSHEET and st.toggle("🗄️ Include Archive", key=f"show_archive_{category_name}", help=f"Jobs completed and invoiced over {ARCHIVE_AFTER_DAYS} days ago (read-only)"):
+            render_archive()
+
+    # --- BULK ACTIONS ---
+    picked = df.index[has_ids(df.index, st.session_state.get("bulk_selected", ())) & (df["Category"] == category_name)]
+    if len(picked):
+        render_bulk_actions(category_name, picked, sub_services)
+
+    # --- BULK JOB CARDS ---
+    with st.expander("📄 Export Job Cards", expanded=False):
+        c1, c2 = st.columns(2)
+        scope = c1.radio("Jobs", ["Current", "Old", "All"], horizontal=True, key=f"cards_scope_{category_name}", help="Uses the search filter above")
+        fmt = c2.radio("Format", ["One PDF", "ZIP"], horizontal=True, key=f"cards_fmt_{category_name}")
+        picked = {"Current": active, "Old": old, "All": category_df}[scope]
+        if st.button(f"🖨️ Build {len(picked)} Job Cards", key=f"cards_build_{category_name}", disabled=picked.empty):
+            bar = st.progress(0.0, "Rendering...")
+            rows = [(f"Job_{i}", r) for i, r in zip(picked.index, picked.to_dict("records"))]
+            data = export_job_cards(rows, as_zip=fmt == "ZIP", progress=lambda done, total: bar.progress(done / total, f"Rendering {done}/{total}"))
+            ext = "zip" if fmt == "ZIP" else "pdf"
+            st.session_state[f"cards_{category_name}"] = (f"Job_Cards_{category_name.split()[0]}_{scope}.{ext}", data, "application/zip" if ext == "zip" else "application/pdf")
+            bar.empty()
+        if f"cards_{category_name}" in st.session_state:
+            name, data, mime = st.session_state[f"cards_{category_name}"]
+            st.download_button(f"⬇️ Download {name}", data, name, mime, key=f"cards_dl_{category_name}")
+
+    # --- IMPORT / EXPORT ---
+    with st.expander("📥 Import / Export", expanded=False):
+        c1, c2 = st.columns(2)
+        scope = c1.radio("Export", ["Current", "Old", "All"], horizontal=True, key=f"export_scope_{category_name}", help="Uses the search filter above")
+        view = {"Current": active, "Old": old, "All": category_df}[scope]
+        # Built only when clicked. download_button takes the whole file, so the chunks are joined here; only the CLI streams them
+        c2.download_button(f"⬇️ Export {len(view)} Jobs (CSV)", lambda: "".join(export_csv(view)), f"Jobs_{category_name.split()[0]}_{scope}.csv", "text/csv", key=f"export_{category_name}", disabled=view.empty, on_click="ignore")
+        st.divider()
+        up = st.file_uploader("Import Jobs (CSV or Excel)", type=["csv", "xlsx", "xls"], key=f"import_{category_name}_{st.session_state.get('import_epoch', 0)}", help=f"Added as new jobs; rows without a Category go to {category_name}")
+        if up: render_import(up, category_name)
 
     # --- EDIT FORM ---
     sel_idx = st.session_state["selected_idx"]
-    if sel_idx is not None and sel_idx in st.session_state["master_df"].index:
-        row = st.session_state["master_df"].loc[sel_idx]
+    if sel_idx is not None and sel_idx in jobs().index:
+        row = jobs().loc[sel_idx]
         
         if row.get("Category") == category_name:
             st.divider()
@@ -281,7 +400,7 @@ def render_category_tab(category_name, sub_services=None):
             c_b.download_button("📄 Download Job Card", create_job_card(row.to_dict()), f"Job_{sel_idx}.pdf", "application/pdf", key=f"dl_pdf_{category_name}_{sel_idx}")
 
             with st.form(f"edit_{sel_idx}"):
-                edit_d = row.to_dict()
+                edit_d = {}
                 if category_name == "Transformer Servicing":
                     c1, c2 = st.columns(2)
                     edit_d["Date_Received"] = c1.date_input("Recv Date", parse_date_safe(row.get("Date_Received")))
@@ -294,65 +413,112 @@ def render_category_tab(category_name, sub_services=None):
                     edit_d["Technician"] = c2.text_input("Technician", row.get("Technician"))
                 
                 edit_d["Notes"] = st.text_area("Notes", row.get("Notes"))
-                up_new = st.file_uploader("Upload New File")
+                links = str(row.get("Photo_Link") or "").split()
+                if links: st.caption("Files: " + "  ".join(f"[{i}]({link})" for i, link in enumerate(links, 1)))
+                up_new = st.file_uploader("Add Files", accept_multiple_files=True)
                 
                 if st.form_submit_button("💾 Save Changes"):
                     if up_new:
-                        ext = up_new.name.split('.')[-1]
-                        edit_d["Photo_Link"] = upload_to_drive(up_new, f"Update_{sel_idx}.{ext}")
-                    
-                    for k, v in edit_d.items():
-                        if isinstance(v, (datetime, pd.Timestamp)): 
-                            st.session_state["master_df"].at[sel_idx, k] = v
-                        else:
-                            st.session_state["master_df"].at[sel_idx, k] = v
+                        edit_d["Photo_Link"] = " ".join(dict.fromkeys(links + upload_attachments(up_new, f"Update_{sel_idx}").split()))
                     
+                    edit_job(sel_idx, changed_values(row, edit_d))
                     with st.spinner("Saving..."):
                         sync_data(force_reload=True)
 
                 if st.form_submit_button("🗑️ Delete"):
-                    st.session_state["master_df"] = st.session_state["master_df"].drop(sel_idx).reset_index(drop=True)
+                    delete_job(sel_idx)
                     st.session_state["selected_idx"] = None
                     with st.spinner("Deleting..."):
                         sync_data(force_reload=True)
 
+def render_bulk_actions(category_name, picked, sub_services):
+    """Actions for the picked rows; each is staged for all of them and saved as a single write."""
+    def clear():
+        st.session_state["bulk_selected"] = set()
+
+    def save(values=None):
+        if values is None: delete_jobs(picked); clear()
+        else: edit_jobs(picked, values)
+        with st.spinner("Saving..."):
+            sync_data(force_reload=True)
+
+    with st.container(border=True):
+        st.markdown(f"**☑ {len(picked)} Job{'s' if len(picked) != 1 else ''} Picked**")
+        b1, b2, b3, b4 = st.columns(4)
+        if b1.button("✅ Mark Done", key=f"bulk_done_{category_name}"): save({"Completed": True})
+        if b2.button("💰 Mark Invoiced", key=f"bulk_inv_{category_name}"): save({"Invoiced": True})
+        with b3.popover("🗑️ Delete", use_container_width=True):
+            if st.button(f"Confirm: delete {len(picked)} job{'s' if len(picked) != 1 else ''}", key=f"bulk_del_{category_name}", type="primary"): save()
+        b4.button("✖ Clear Picks", key=f"bulk_clear_{category_name}", on_click=clear)
+
+        c1, c2 = st.columns(2)
+        with c1.form(f"bulk_tech_{category_name}", border=False):
+            tech = st.text_input("Technician", key=f"bulk_tech_val_{category_name}")
+            if st.form_submit_button("👷 Reassign Technician"): save({"Technician": tech})
+        with c2.form(f"bulk_service_{category_name}", border=False):
+            service = st.selectbox("Work Required", sub_services or [category_name], index=None, key=f"bulk_service_val_{category_name}")
+            if st.form_submit_button("🔧 Change Service") and service: save({"Service_Type": service})
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def check_import(data, name, category_name, dayfirst):
+    """Reads and validates an uploaded job list (see job_io.validate); cached, so reruns do not repeat it."""
+    mapped, mapping, unmatched = map_columns(read_table(io.BytesIO(data), name))
+    return *validate(mapped, category_name, dayfirst), mapping, unmatched
+
+def render_import(file, category_name):
+    """Shows how an uploaded job list maps and what is wrong with it, and adds its valid rows as new jobs in one write."""
+    dayfirst = st.toggle("Dates are day first (31/12/2024)", True, key=f"import_dayfirst_{category_name}")
+    try:
+        new, problems, mapping, unmatched = check_import(file.getvalue(), file.name, category_name, dayfirst)
+    except Exception as e:
+        st.error(f"Could not read {file.name}: {e}"); return
+
+    renamed = [f"{src} → {col}" for src, col in mapping.items() if src != col]
+    st.caption(f"Columns: {len(mapping)} matched{' (' + ', '.join(renamed) + ')' if renamed else ''}; ignored: {', '.join(map(str, unmatched)) or 'none'}")
+    if len(problems):
+        st.warning(f"{problems['Row'].nunique()} row(s) have problems and will be skipped.")
+        st.dataframe(problems, use_container_width=True, hide_index=True)
+        st.download_button("⬇️ Download Problems", problems.to_csv(index=False), f"Problems_{file.name}.csv", "text/csv", key=f"import_problems_{category_name}")
+    if st.button(f"📥 Import {len(new)} Jobs", key=f"import_go_{category_name}", type="primary", disabled=new.empty):
+        append_jobs(new.drop(columns=[ID_COL, VERSION_COL]).to_dict("records"))
+        st.session_state["import_epoch"] = st.session_state.get("import_epoch", 0) + 1  # empty the uploader
+        with st.spinner(f"Saving {len(new)} jobs..."):
+            sync_data(force_reload=True)
+
 # --- RENDER NOTES TAB ---
 def render_notes_tab():
-    df = st.session_state["master_df"]
+    df = jobs()
     notes_df = df[df["Category"] == "General Note"] if "Category" in df.columns else pd.DataFrame()
 
     with st.expander("➕ Add New Note", expanded=False):
         with st.form("add_note_form", clear_on_submit=True):
             note_date = st.date_input("Date", datetime.now())
             note_content = st.text_area("Note Content")
-            note_file = st.file_uploader("📎 Attach File (Optional)")
+            note_files = st.file_uploader("📎 Attach Files (Optional)", accept_multiple_files=True)
             
             if st.form_submit_button("💾 Save New Note"):
                 new_note = {"Date": note_date, "Category": "General Note", "Notes": note_content}
-                if note_file:
-                    ext = note_file.name.split('.')[-1]
-                    link = upload_to_drive(note_file, f"Note_{datetime.now().strftime('%M%S')}.{ext}")
-                    new_note["Photo_Link"] = link or ""
+                new_note["Photo_Link"] = upload_attachments(note_files, "Note")
                 
-                # Align columns
-                new_row = pd.DataFrame([new_note])
-                st.session_state["master_df"] = pd.concat([st.session_state["master_df"], new_row], ignore_index=True)
+                append_job(new_note)
                 with st.spinner("Saving Note..."):
                     sync_data(force_reload=True)
 
     st.divider()
     st.subheader("📝 My Notes")
+    search = st.text_input("🔍 Search Notes", key="s_notes", placeholder="e.g. transformer  or  date:2024-05")
+    if not notes_df.empty and search:
+        notes_df = notes_df[has_ids(notes_df.index, get_store().search(search))]
 
     if notes_df.empty:
         st.info("No notes found.")
         return
 
-    df_show = notes_df.copy()
-    df_show.insert(0, "Select", False)
-    if st.session_state["selected_idx"] in df_show.index:
-        df_show.at[st.session_state["selected_idx"], "Select"] = True
-
+    notes_df, page = paginate(notes_df, "page_notes")
     cols_order = ["Date", "Notes", "Photo_Link"]
+    df_show = notes_df.reindex(columns=[c for c in cols_order if c in notes_df.columns])
+    df_show.insert(0, "Select", df_show.index == st.session_state["selected_idx"])
+    df_show["Photo_Link"] = first_link(df_show["Photo_Link"])
     final_cols = ["Select"] + [c for c in cols_order if c in df_show.columns]
 
     col_config = {
@@ -362,89 +528,171 @@ def render_notes_tab():
         "Notes": st.column_config.TextColumn("Content", width="large")
     }
 
-    edited = st.data_editor(
+    data_cols = [c for c in final_cols if c not in ["Select", "Photo_Link"]]
+    key = editor_key(f"editor_notes_{page}")
+    st.data_editor(
         df_show[final_cols], 
         use_container_width=True, 
         hide_index=True,
         column_config=col_config,
         disabled=["Photo_Link"],
-        key="editor_notes"
+        key=key,
+        on_change=apply_editor_delta,
+        args=(key, list(df_show.index), data_cols)
     )
 
-    data_cols = [c for c in final_cols if c not in ["Select", "Photo_Link"]]
-    if not edited[data_cols].astype(str).equals(df_show[data_cols].astype(str)):
-        st.session_state["master_df"].loc[edited.index, data_cols] = edited[data_cols]
-        st.session_state["unsaved_changes"] = True
-        st.rerun()
-
-    sel = edited[edited["Select"] == True]
-    if not sel.empty:
-        if sel.index[0] != st.session_state["selected_idx"]:
-            st.session_state["selected_idx"] = sel.index[0]
-            st.rerun()
-    elif st.session_state["selected_idx"] in edited.index and not edited.at[st.session_state["selected_idx"], "Select"]:
-        st.session_state["selected_idx"] = None
-        st.rerun()
-
     sel_idx = st.session_state["selected_idx"]
-    if sel_idx is not None and sel_idx in st.session_state["master_df"].index:
-        row = st.session_state["master_df"].loc[sel_idx]
+    if sel_idx is not None and sel_idx in jobs().index:
+        row = jobs().loc[sel_idx]
         if row.get("Category") == "General Note":
             st.divider()
             st.markdown(f"### ✏️ Editing Note")
             with st.form(f"edit_note_{sel_idx}"):
-                edit_d = row.to_dict()
+                edit_d = {}
                 edit_d["Date"] = st.date_input("Date", parse_date_safe(row.get("Date")))
                 edit_d["Notes"] = st.text_area("Content", row.get("Notes"))
-                curr_file = row.get("Photo_Link", "")
-                if curr_file and len(str(curr_file)) > 5: st.caption(f"Current File: [View]({curr_file})")
+                curr_files = [link for link in str(row.get("Photo_Link") or "").split() if len(link) > 5]
+                if curr_files: st.caption("Current File: " + "  ".join(f"[View]({link})" for link in curr_files))
                 up_new = st.file_uploader("Replace File")
 
                 c_save, c_del = st.columns([1, 1])
                 with c_save:
                     if st.form_submit_button("💾 Save Changes"):
                         if up_new:
-                            ext = up_new.name.split('.')[-1]
-                            edit_d["Photo_Link"] = upload_to_drive(up_new, f"Update_Note_{sel_idx}.{ext}")
-                        for k, v in edit_d.items():
-                            if isinstance(v, (datetime, pd.Timestamp)): 
-                                st.session_state["master_df"].at[sel_idx, k] = v
-                            else:
-                                st.session_state["master_df"].at[sel_idx, k] = v
+                            edit_d["Photo_Link"] = upload_attachments([up_new], f"Update_Note_{sel_idx}")
+                        edit_job(sel_idx, changed_values(row, edit_d))
                         with st.spinner("Saving..."): sync_data(force_reload=True)
                 with c_del:
                     if st.form_submit_button("🗑️ Delete Note"):
-                        st.session_state["master_df"] = st.session_state["master_df"].drop(sel_idx).reset_index(drop=True)
+                        delete_job(sel_idx)
                         st.session_state["selected_idx"] = None
                         with st.spinner("Deleting..."): sync_data(force_reload=True)
 
+def render_dashboard():
+    """Operational KPIs from the store's running totals (JobStore.kpis()), so the tab costs no pass over the table."""
+    store = get_store()
+    if "Category" not in store.df.columns: return
+    try:
+        totals, left_out = store.kpis(archived=bool(ARCHIVE_WORKSHEET)), None
+    except Exception as e:
+        totals, left_out = store.kpis(), e
+    months = sorted(totals["turnaround"].index.unique("Month"))
+    picked = None
+    if len(months) > 1:
+        start, end = st.select_slider("Turnaround for stages finished", options=months, value=(months[max(0, len(months) - 12)], months[-1]), format_func=str)
+        picked = [m for m in months if start <= m <= end]
+    if left_out is not None:
+        st.warning(f"Archived jobs could not be read, so turnaround covers only the last {ARCHIVE_AFTER_DAYS} days of closed jobs: {left_out}")
+    k = kpis.summary(totals, picked)
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Open Jobs", k["open"])
+    c2.metric("Transformers At PT", k["waiting"]["At PT"])
+    c3.metric("Done, Not Invoiced", int(k["unbilled"]["Jobs"].sum()))
+    c4.metric("Quoted, Not Invoiced", f"R {k['unbilled']['Value (R)'].sum():,.0f}")
+
+    st.subheader("⚡ PT Turnaround")
+    d1, d2 = st.columns([1, 2])
+    d1.dataframe(k["turnaround"])
+    d1.caption("Open transformer jobs by where they wait")
+    d1.dataframe(k["waiting"])
+    if not k["monthly"].empty: d2.line_chart(k["monthly"], x_label="Month stage finished", y_label="Avg days")
+
+    st.subheader("👷 Open Jobs per Technician")
+    st.dataframe(k["backlog"])
+
+    st.subheader("🧾 Completed, Not Invoiced")
+    st.dataframe(k["unbilled"], column_config={"Value (R)": st.column_config.NumberColumn(format="R %.2f")})
+    st.caption("Value is the sum of the quote amounts that could be read as a number; \"No quote\" counts the jobs without one.")
+
 # --- MAIN ---
+@st.fragment(run_every=5)
+def render_sync_status():
+    queue = get_queue()
+    pending = queue.pending()
+    conflicts = queue.conflict
+    if conflicts:
+        status = f'<div class="status-box unsaved">⚠️ {conflicts} Conflicting Job{"s" if conflicts != 1 else ""} - See Below</div>'
+    elif pending:
+        status = f'<div class="status-box unsaved">⏳ {pending} Write{"s" if pending != 1 else ""} Pending{" - Offline, Retrying" if queue.last_error else ""}</div>'
+    else:
+        status = '<div class="status-box saved">✅ All Saved</div>'
+    st.markdown(status, unsafe_allow_html=True)
+
+def render_conflicts():
+    """Jobs changed both here and on the sheet since they were read; every other change is saved as usual."""
+    conflicts = get_queue().conflicts()
+    df = jobs()
+    with st.container(border=True):
+        st.warning(f"⚠️ {len(conflicts)} job{'s were' if len(conflicts) != 1 else ' was'} changed by someone else while being edited here.")
+        for c in conflicts:
+            if c["row"]: name = c["row"][c["columns"].index("Client_Name")]
+            else: name = df.at[c["id"], "Client_Name"] if c["id"] in df.index else c["id"]
+            mine = "edited" if c["op"] == "put" else "deleted"
+            theirs = "edited" if c["remote"] is not None else "deleted"
+            st.markdown(f"- **{name or c['id']}**: {mine} here, {theirs} on the sheet")
+        k1, k2 = st.columns(2)
+        if k1.button("⬆️ Keep Mine", help="Apply the changes made here over the sheet's"):
+            get_store().resolve(keep_local=True)
+            st.rerun()
+        if k2.button("⬇️ Take Theirs", help="Drop the changes made here and reload those jobs"):
+            get_store().resolve(keep_local=False)
+            st.rerun()
+
+def finish_run():
+    """Closes this run's trace (its spans plus the whole run's time) and keeps it for the performance panel."""
+    tracing.record({"ts": round(time.time(), 3), "span": "rerun", "ms": round((time.perf_counter() - RUN_START) * 1000, 2)})
+    runs = st.session_state.setdefault("trace_runs", deque(maxlen=TRACE_RUNS))
+    runs.append({"at": datetime.now().strftime("%H:%M:%S"), "spans": st.session_state.pop("trace", [])})
+
+def render_perf_panel():
+    """Sidebar timings: milliseconds per stage for this session's last TRACE_RUNS runs, the latest run's spans
+    with their row and byte counts, and the most recent background spans (sheet writes, uploads)."""
+    with st.sidebar:
+        if not st.toggle("⏱️ Performance", key="show_perf"): return
+        runs = list(st.session_state.get("trace_runs", ()))[::-1]
+        if not runs: return
+        stages = pd.DataFrame([{"Run": r["at"], **pd.DataFrame(r["spans"]).groupby("span", sort=False)["ms"].sum()} for r in runs])
+        st.caption("ms per stage, newest first")
+        st.dataframe(stages[["Run", "rerun", *sorted(c for c in stages.columns if c not in ("Run", "rerun"))]], hide_index=True)
+        st.caption(f"Run at {runs[0]['at']}")
+        st.dataframe(pd.DataFrame(runs[0]["spans"]).drop(columns="ts"), hide_index=True)
+        if tracing.background:
+            st.caption("Background")
+            st.dataframe(pd.DataFrame(list(tracing.background)[::-1]).assign(ts=lambda d: pd.to_datetime(d["ts"], unit="s").dt.strftime("%H:%M:%S")), hide_index=True)
+
 def main():
     c1, c2 = st.columns([3, 1])
     c1.title("⚡ UELCO-MANAGER")
-    
-    if st.session_state["unsaved_changes"]:
-        status = '<div class="status-box unsaved">⚠️ Unsaved Changes - Click Sync</div>'
-        btn_label = "💾 Save & Sync"
-    else:
-        status = '<div class="status-box saved">✅ All Saved</div>'
-        btn_label = "🔄 Sync / Refresh"
-        
-    c2.markdown(status, unsafe_allow_html=True)
-    if c2.button(btn_label, type="primary"):
+
+    queue = get_queue()
+    with c2: render_sync_status()
+    if c2.button("🔄 Sync / Refresh", type="primary"):
         with st.spinner("Syncing data..."):
-            sync_data(force_reload=True)
+            refresh_data()
+    if queue.conflict: render_conflicts()
 
     st.markdown(f'<a href="{ONEDRIVE_URL}" target="_blank" class="header-link">📂 Open OneDrive</a>', unsafe_allow_html=True)
 
-    t1, t2, t3, t4 = st.tabs(["💰 Sales", "⚡ Transformer Servicing", "🔌 Fault Finding", "📝 Notes"])
+    # Only the open tab is rendered; switching tabs reruns the script
+    t1, t2, t3, t4, t5 = st.tabs(["💰 Sales", "⚡ Transformer Servicing", "🔌 Fault Finding", "📝 Notes", "📊 Dashboard"], key="main_tab", on_change="rerun")
     
     # MAPPED TO OLD CATEGORIES TO RECOVER DATA
-    with t1: render_category_tab("Sales & Install", ["Order", "Order + Delivery", "Order + Installation", "Quoted", "To Quote"])
-    with t2: render_category_tab("Transformer Servicing", ["Oil Change", "Gasket Replacement", "General Service", "Testing", "Quoted", "To Quote"])
-    with t3: render_category_tab("Cable Faults", ["Thumping/Locating", "Jointing", "Quoted", "To Quote"])
+    if t1.open:
+        with t1: render_category_tab("Sales & Install", CATEGORIES["Sales & Install"])
+    if t2.open:
+        with t2: render_category_tab("Transformer Servicing", CATEGORIES["Transformer Servicing"])
+    if t3.open:
+        with t3: render_category_tab("Cable Faults", CATEGORIES["Cable Faults"])
     
-    with t4: render_notes_tab()
+    if t4.open:
+        with t4: render_notes_tab()
+    if t5.open:
+        with t5: render_dashboard()
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        finish_run()
+    render_perf_panel()
@@ -0,0 +1,92 @@
+import hashlib
+import io
+import sqlite3
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from PIL import Image, ImageOps
+
+# Formats decoded and re-encoded before upload; anything else (PDFs, videos, HEIC...) is uploaded as is
+IMAGE_TYPES = ("JPEG", "PNG", "WEBP", "BMP", "TIFF")
+
+class Attachment(io.BytesIO):
+    """A file ready for upload_files(): its (possibly recompressed) bytes, upload name and type, the
+    SHA-256 of the file as picked, and a JPEG thumbnail (None if it is not an image)."""
+
+    def __init__(self, data, name, type, digest, thumb=None):
+        super().__init__(data)
+        self.name, self.type, self.digest, self.thumb = name, type, digest, thumb
+        self.size = len(data)
+
+def _encode(img, fmt, quality):
+    out = io.BytesIO()
+    if fmt == "PNG": img.save(out, "PNG", optimize=True)
+    else: img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+def prepare(file, prefix, max_side=1600, quality=80, thumb_side=96):
+    """Turns one uploaded file into an Attachment named `{prefix}_{hash}.{ext}`.
+
+    Images are turned upright (EXIF orientation), shrunk to fit `max_side` pixels (None keeps the size) and
+    re-encoded as JPEG at `quality`, or as PNG if they have transparency; the result is kept only if it was
+    shrunk or came out smaller. The hash is of the original bytes, so the same file always gets the same name."""
+    data = file.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    ext, ctype, thumb = file.name.rsplit(".", 1)[-1].lower() if "." in file.name else "bin", file.type, None
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.format not in IMAGE_TYPES: raise ValueError(img.format)
+        img = ImageOps.exif_transpose(img)
+    except Exception:
+        img = None
+    if img is not None:
+        fmt = "PNG" if img.has_transparency_data else "JPEG"
+        img = img.convert("RGBA" if fmt == "PNG" else "RGB")
+        shrunk = bool(max_side) and max(img.size) > max_side
+        if shrunk: img.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = _encode(img, fmt, quality)
+        if shrunk or len(out) < len(data):
+            data, ext, ctype = out, "png" if fmt == "PNG" else "jpg", f"image/{fmt.lower()}"
+        img.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+        thumb = _encode(img.convert("RGB"), "JPEG", 70)
+    return Attachment(data, f"{prefix}_{digest[:16]}.{ext}", ctype, digest, thumb)
+
+def prepare_files(files, prefix, workers=4, **options):
+    """prepare() for several files at once (decoding and resizing release the GIL); results in input order."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda f: prepare(f, prefix, **options), files))
+
+class AttachmentIndex:
+    """Content hash -> Drive link and thumbnail of every file uploaded from here, in sqlite.
+
+    A file picked again (for any job) is found by its hash and not uploaded twice; tables look the
+    thumbnails up by link for their preview column."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._db() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS attachments (digest TEXT PRIMARY KEY, link TEXT, thumb BLOB)")
+            db.execute("CREATE INDEX IF NOT EXISTS attachments_link ON attachments (link)")
+
+    def _db(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def links(self, digests):
+        """{digest: link} for the hashes already uploaded."""
+        digests = list(set(digests))
+        if not digests: return {}
+        with self._db() as db:
+            return dict(db.execute(f"SELECT digest, link FROM attachments WHERE digest IN ({','.join('?' * len(digests))})", digests))
+
+    def add(self, attachments, links):
+        with self._db() as db:
+            db.executemany("INSERT OR REPLACE INTO attachments (digest, link, thumb) VALUES (?, ?, ?)",
+                           [(a.digest, link, a.thumb) for a, link in zip(attachments, links) if link])
+
+    def thumbnails(self, links):
+        """{link: data URL} of the stored thumbnails, for st.column_config.ImageColumn."""
+        links = list({link for link in links if link})
+        if not links: return {}
+        with self._db() as db:
+            rows = db.execute(f"SELECT link, thumb FROM attachments WHERE thumb IS NOT NULL AND link IN ({','.join('?' * len(links))})", links)
+            return {link: "data:image/jpeg;base64," + b64encode(thumb).decode() for link, thumb in rows}
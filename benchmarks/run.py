@@ -0,0 +1,227 @@
+"""Times the app's main paths against an in-memory spreadsheet, without touching the live sheet.
+
+Each scenario drives app.py through Streamlit's AppTest and is run twice, from the same starting state:
+once for wall time, once under tracemalloc for peak memory (Python and numpy allocations; Arrow string
+buffers are reported separately as their net growth). Writes are journaled in a temporary folder, and `flush ms` is how long the
+background writer then took to apply them to the stub sheet.
+
+    python -m benchmarks.run                                   # 1k, 10k and 100k rows, every scenario
+    python -m benchmarks.run --rows 10000 --only load search edit --latency 0.2
+    python -m benchmarks.run --csv exported_sheets/ --json before.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest import mock
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.element_tree import Dataframe, Widget
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks.stub_sheets import StubConnection
+from benchmarks.synthetic import make_jobs
+from job_store import JobStore
+
+APP = os.path.join(ROOT, "app.py")
+TAB = "Sales & Install"  # the tab open on a fresh session
+TIMEOUT = 600
+STORES = []  # every JobStore the app built, newest last
+
+class _EditedTable(Widget):
+    """A data editor with cells edited, as the browser would report it (AppTest has no data-editor widget)."""
+
+    def __init__(self, proto, root, edited_rows):
+        super().__init__(proto, root)
+        self.type = "data_editor"
+        self._value = {"edited_rows": edited_rows, "added_rows": [], "deleted_rows": []}
+
+    @property
+    def value(self):
+        return self._value
+
+    @property
+    def _widget_state(self):
+        ws = WidgetState()
+        ws.id = self.id
+        ws.string_value = json.dumps(self._value)
+        return ws
+
+def _edit_table(at, key_prefix, edited_rows):
+    """Swaps the data editor whose key starts with `key_prefix` for one with `edited_rows`; run() then sends them."""
+    stack = [at._tree]
+    while stack:
+        node = stack.pop()
+        for i, child in getattr(node, "children", {}).items():
+            if isinstance(child, Dataframe) and (child.key or "").startswith(key_prefix):
+                node.children[i] = _EditedTable(child.proto, at._tree, edited_rows)
+                return at
+            stack.append(child)
+    raise LookupError(f"no data editor {key_prefix}*")
+
+def _button(at, label):
+    return next(b for b in at.button if label in b.label)
+
+def _first_open_job(conn):
+    df = conn.sheets["Sheet1"].frame()
+    return df.loc[(df["Category"] == TAB) & (df["Completed"] != "TRUE"), "Job_ID"].iloc[0]
+
+# --- SCENARIOS ---
+# name -> (setup(conn, run) returning a ready AppTest, action(at, run) timed); `run` counts the repetitions
+
+def _fresh(conn, run):
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    return AppTest.from_file(APP, default_timeout=TIMEOUT)
+
+def _warm(conn, run):
+    return AppTest.from_file(APP, default_timeout=TIMEOUT).run()
+
+def _cold(conn, run):
+    """A warm session whose store has yet to build its search index, read the archive or tally the dashboard;
+    otherwise the memory run would reuse what the timed run built."""
+    at = _warm(conn, run)
+    store = STORES[-1]
+    store._index = store._kpis = store._archive = store._archive_index = store._archive_kpis = None
+    return at
+
+def _selected(conn, run):
+    at = AppTest.from_file(APP, default_timeout=TIMEOUT)
+    at.session_state["selected_idx"] = _first_open_job(conn)
+    return at.run()
+
+def _searched(conn, run):
+    return _warm(conn, run).text_input(key=f"s_{TAB}").set_value("eskom").run()
+
+def _picked(conn, run):
+    at = _warm(conn, run)
+    return _button(at, "Pick All").click().run()
+
+def _add(at, run):
+    next(t for t in at.text_input if t.label == "Client Name").set_value(f"Benchmark {run}")
+    _button(at, "Save New Job").click().run()
+
+def _edit_form(at, run):
+    [t for t in at.text_area if t.label == "Notes"][-1].set_value(f"edited {run}")
+    _button(at, "Save Changes").click().run()
+
+def _dashboard(at, run):
+    at.session_state["main_tab"] = "📊 Dashboard"
+    at.run()
+
+def _reassign(at, run):
+    at.text_input(key=f"bulk_tech_val_{TAB}").set_value(f"Bench {run}")
+    _button(at, "Reassign Technician").click().run()
+
+SCENARIOS = {
+    "load": (_fresh, lambda at, run: at.run()),
+    "rerun": (_warm, lambda at, run: at.run()),
+    "search": (_cold, lambda at, run: at.text_input(key=f"s_{TAB}").set_value("tech:john eskom").run()),
+    "edit": (_warm, lambda at, run: _edit_table(at, f"ed_{TAB}_act_1_", {0: {"Notes": f"edited {run}"}}).run()),
+    "edit_form": (_selected, _edit_form),
+    "add": (_warm, _add),
+    "delete": (_selected, lambda at, run: _button(at, "🗑️ Delete").click().run()),
+    "bulk": (_picked, _reassign),
+    "job_cards": (_searched, lambda at, run: _button(at, "Build").click().run()),
+    "dashboard": (_cold, _dashboard),
+}
+
+def _pending(path):
+    if not os.path.exists(path): return 0
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+
+def _settle():
+    """Waits for the search index the last load started building in the background, so it runs in no scenario's time."""
+    builder = STORES[-1]._builder if STORES else None
+    if builder is not None: builder.join()
+
+def _drain(path, timeout=600):
+    start = time.perf_counter()
+    while _pending(path) and time.perf_counter() - start < timeout:
+        time.sleep(0.005)
+    return (time.perf_counter() - start) * 1000
+
+def _tracked(init):
+    def __init__(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        STORES.append(self)
+    return __init__
+
+def run_size(conn, names, rows):
+    """Runs the scenarios `names` on `conn`; one result dict per scenario."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, mock.patch("streamlit.connection", lambda *a, **k: conn), \
+            mock.patch.object(JobStore, "__init__", _tracked(JobStore.__init__)):
+        cwd = os.getcwd()
+        os.chdir(tmp)  # journal, attachment index and trace log stay in here
+        try:
+            st.cache_resource.clear()
+            st.cache_data.clear()
+            AppTest.from_file(APP, default_timeout=TIMEOUT).run()  # first load, outside every scenario
+            _drain("pending_writes.db")
+            _settle()
+            for name in names:
+                setup, action = SCENARIOS[name]
+                at = setup(conn, 0)
+                _drain("pending_writes.db")
+                _settle()
+                calls = dict(conn.calls)
+                start = time.perf_counter()
+                action(at, 0)
+                ms = (time.perf_counter() - start) * 1000
+                flush = _drain("pending_writes.db")
+                requests = sum(conn.calls.values()) - sum(calls.values())
+                errors = [e.value for e in at.exception]
+
+                at = setup(conn, 1)
+                _drain("pending_writes.db")
+                _settle()
+                arrow = pa.total_allocated_bytes()
+                tracemalloc.start()
+                action(at, 1)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                arrow = pa.total_allocated_bytes() - arrow
+                _drain("pending_writes.db")
+
+                results.append({"rows": rows, "scenario": name, "ms": round(ms, 1), "flush ms": round(flush, 1), "requests": requests,
+                                "peak MB": round(peak / 2 ** 20, 1), "arrow MB": round(arrow / 2 ** 20, 1), "error": "; ".join(errors)})
+                print(f"{rows:>7} {name:<10} {ms:>9.1f} ms  flush {flush:>8.1f} ms  {peak / 2 ** 20:>7.1f} MB{'  ' + results[-1]['error'] if errors else ''}", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app against a stub spreadsheet.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="synthetic table sizes")
+    parser.add_argument("--csv", help="folder of <worksheet>.csv files to use instead of synthetic data")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every sheet API call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results here, to compare runs")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.csv:
+        conn = StubConnection.from_csv(args.csv, latency=args.latency)
+        results += run_size(conn, args.only, len(conn.sheets["Sheet1"].grid) - 1)
+    else:
+        for rows in args.rows:
+            conn = StubConnection({"Sheet1": make_jobs(rows, args.seed)}, latency=args.latency)
+            results += run_size(conn, args.only, rows)
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.json:
+        with open(args.json, "w") as f: json.dump(results, f, indent=1)
+
+if __name__ == "__main__":
+    main()
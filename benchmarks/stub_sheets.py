@@ -0,0 +1,139 @@
+import glob
+import os
+import re
+import threading
+import time
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+class StubSheet:
+    """One worksheet as a grid of strings, row 0 the header, like the values the Sheets API hands back."""
+
+    def __init__(self, df):
+        self.grid = [list(map(str, df.columns))] + df.astype(str).where(df.notna(), "").values.tolist()
+
+    def frame(self):
+        header = self.grid[0]
+        rows = [row + [""] * (len(header) - len(row)) for row in self.grid[1:]]
+        return pd.DataFrame(rows, columns=header).replace({"": None})
+
+class StubSpreadsheet:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def worksheet(self, name):
+        if name not in self.conn.sheets: raise WorksheetNotFound(name)
+        return StubWorksheet(self.conn, name)
+
+    def get_lastUpdateTime(self):
+        self.conn._call("get_lastUpdateTime")
+        return str(self.conn.modified)
+
+    def batch_update(self, body):
+        # Only the row deletions sheet_sync sends, each on the worksheet its sheetId names
+        self.conn._call("spreadsheet.batch_update")
+        for req in body["requests"]:
+            r = req["deleteDimension"]["range"]
+            sheet = self.conn._by_id(r["sheetId"])
+            del sheet.grid[r["startIndex"]:r["endIndex"]]
+        self.conn.modified += 1
+
+class StubWorksheet:
+    """The parts of a gspread Worksheet the app uses, on a StubSheet."""
+
+    def __init__(self, conn, name):
+        self.conn, self.name = conn, name
+        self.spreadsheet = StubSpreadsheet(conn)
+        self.id = list(conn.sheets).index(name)
+
+    @property
+    def _sheet(self):
+        return self.conn.sheets[self.name]
+
+    def row_values(self, row):
+        self.conn._call("row_values")
+        grid = self._sheet.grid
+        return list(grid[row - 1]) if len(grid) >= row else []
+
+    def batch_get(self, ranges):
+        self.conn._call("batch_get")
+        out = []
+        for rng in ranges:
+            row, col = a1_to_rowcol(re.fullmatch(r"([A-Z]+\d+):[A-Z]+\d*", rng).group(1))
+            values = [[r[col - 1]] if col <= len(r) and r[col - 1] != "" else [] for r in self._sheet.grid[row - 1:]]
+            while values and not values[-1]: values.pop()  # the API drops trailing empty rows
+            out.append(values)
+        return out
+
+    def batch_update(self, data, **kwargs):
+        self.conn._call("batch_update")
+        grid = self._sheet.grid
+        for d in data:
+            row, col = a1_to_rowcol(d["range"].split(":")[0])
+            for k, values in enumerate(d["values"]):
+                line = grid[row - 1 + k]
+                line += [""] * (col - 1 + len(values) - len(line))
+                line[col - 1:col - 1 + len(values)] = map(str, values)
+        self.conn.modified += 1
+
+    def append_rows(self, values, **kwargs):
+        self.conn._call("append_rows")
+        self._sheet.grid += [list(map(str, row)) for row in values]
+        self.conn.modified += 1
+
+class _Client:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _select_worksheet(self, worksheet=None, **kwargs):
+        if worksheet not in self.conn.sheets: raise WorksheetNotFound(worksheet)
+        return StubWorksheet(self.conn, worksheet)
+
+class StubConnection:
+    """Stand-in for GSheetsConnection that keeps the spreadsheet in memory: read/update/create plus the
+    row-level worksheet calls sheet_sync makes through `client`.
+
+    Every API call sleeps `latency` seconds, to mimic the round trip to Google, and is counted in `calls`.
+    from_csv()/to_csv() load and save the worksheets as one CSV file each."""
+
+    def __init__(self, sheets=None, latency=0.0):
+        self.sheets = {name: StubSheet(df) for name, df in (sheets or {}).items()}
+        self.latency = latency
+        self.calls = {}
+        self.modified = 0  # bumped by every write; the spreadsheet's change stamp
+        self.client = _Client(self)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, folder, latency=0.0):
+        paths = sorted(glob.glob(os.path.join(folder, "*.csv")))
+        return cls({os.path.splitext(os.path.basename(p))[0]: pd.read_csv(p, dtype=str, keep_default_na=False) for p in paths}, latency)
+
+    def to_csv(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        for name, sheet in self.sheets.items():
+            sheet.frame().to_csv(os.path.join(folder, f"{name}.csv"), index=False)
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency: time.sleep(self.latency)
+
+    def _by_id(self, sheet_id):
+        return self.sheets[list(self.sheets)[sheet_id]]
+
+    def read(self, worksheet="Sheet1", ttl=None, **kwargs):
+        self._call("read")
+        if worksheet not in self.sheets: raise WorksheetNotFound(worksheet)
+        return self.sheets[worksheet].frame()
+
+    def update(self, worksheet="Sheet1", data=None, **kwargs):
+        self._call("update")
+        self.sheets[worksheet] = StubSheet(data)
+        self.modified += 1
+
+    def create(self, worksheet="Sheet1", data=None, **kwargs):
+        self._call("create")
+        self.sheets[worksheet] = StubSheet(data)
+        self.modified += 1
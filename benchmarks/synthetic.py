@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from schema import CATEGORIES, DATE_FMT, EXPECTED_COLS
+
+# Share of rows per category; the rest are General Notes
+MIX = {"Sales & Install": 0.3, "Transformer Servicing": 0.3, "Cable Faults": 0.3}
+
+CLIENTS = ["Eskom", "City Power", "Sasol", "Anglo American", "Transnet", "Mondi", "Spar", "Pick n Pay", "Shoprite", "Sibanye", "Tshwane Metro", "Harmony Gold", "Mr Naidoo", "Mrs van der Merwe", "Dlamini Farms", "Nkosi Holdings"]
+PLACES = ["Workshop", "Site", "Head Office", "Depot", "Client Premises"]
+TECHNICIANS = ["John", "Sipho", "Pieter", "Thabo", "Riaan", "Lerato", ""]
+LOCATIONS = ["Pretoria", "Johannesburg", "Centurion", "Midrand", "Witbank", "Rustenburg", "Polokwane", "Secunda"]
+WORDS = "oil leak gasket replaced tested ok client to collect quote sent awaiting approval cable joint thumped fault located 11kV 22kV transformer kiosk minisub breaker relay insulation resistance".split()
+
+def make_jobs(n, seed=0, days=150):
+    """A job table of `n` rows shaped like the real sheet (every cell a string, as the API reads it): categories
+    per MIX, dates within the last `days` days (the default keeps every row clear of the app's archiving),
+    about 70% completed and most of those invoiced, SA phone numbers typed several ways, notes of a few to
+    ~40 words and some file links. The same `n` and `seed` give the same table on the same day."""
+    rng = np.random.default_rng(seed)
+    cats = np.array([*MIX, "General Note"])
+    category = rng.choice(cats, n, p=[*MIX.values(), 1 - sum(MIX.values())])
+
+    def pick(values): return np.array(values, dtype=object)[rng.integers(0, len(values), n)]
+
+    def dates(share=1.0):
+        d = pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(0, days, n), unit="D")
+        return pd.Series(d.strftime(DATE_FMT)).where(rng.random(n) < share, "")
+
+    def ids(): return [f"J{x:011x}" for x in rng.integers(0, 16 ** 11, n)]  # like schema.new_ids
+
+    service = np.empty(n, dtype=object)
+    for cat, options in CATEGORIES.items():
+        mask = category == cat
+        service[mask] = np.array(options, dtype=object)[rng.integers(0, len(options), mask.sum())]
+    service[category == "General Note"] = ""
+
+    digits = pd.Series(rng.integers(600_000_000, 850_000_000, n).astype(str))
+    phone = pd.Series(np.select([rng.random(n) < 0.5, rng.random(n) < 0.5], ["0" + digits, "+27 " + digits], "0" + digits.str[:2] + " " + digits.str[2:5] + " " + digits.str[5:]))
+    completed = rng.random(n) < 0.7
+    lengths = rng.integers(3, 40, n)
+    words = np.array(WORDS, dtype=object)
+    notes = [" ".join(words[rng.integers(0, len(words), k)]) for k in lengths]
+    transformer = category == "Transformer Servicing"
+
+    df = pd.DataFrame({
+        "Date": dates(),
+        "Date_Received": dates().where(transformer, ""),
+        "Date_Sent_To_PT": dates(0.7).where(transformer, ""),
+        "Date_Back_From_PT": dates(0.5).where(transformer, ""),
+        "Date_Client_Pickup": dates(0.4).where(transformer & completed, ""),
+        "Completed": np.where(completed, "TRUE", "FALSE"),
+        "Invoiced": np.where(completed & (rng.random(n) < 0.8), "TRUE", "FALSE"),
+        "Client_Name": pick(CLIENTS),
+        "Client_Contact": phone.where(category != "General Note", ""),
+        "Service_Type": service,
+        "Notes": notes,
+        "Location": pick(LOCATIONS),
+        "Place_Received": pick(PLACES),
+        "Quote_Amount": pd.Series((rng.integers(5, 500, n) * 100).astype(str)).where(rng.random(n) < 0.6, ""),
+        "Technician": pick(TECHNICIANS),
+        "Category": category,
+        "Photo_Link": pd.Series([f"https://drive.google.com/file/d/{i}/view" for i in ids()]).where(rng.random(n) < 0.3, ""),
+        "OneDrive_Link": "",
+        "Job_ID": ids(),
+        "Version": "1",
+    })
+    return df[EXPECTED_COLS]
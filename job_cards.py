@@ -0,0 +1,99 @@
+import io
+import os
+import zipfile
+from functools import lru_cache
+from fpdf import FPDF
+from tracing import span
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "template.jpg")
+CARD_FIELDS = [("Ref", "Category"), ("Client", "Client_Name"), ("Contact", "Client_Contact"), ("Service", "Service_Type"), ("Date", "Date"), ("Date Recv", "Date_Received"), ("Tech", "Technician"), ("Loc", "Location"), ("Quote", "Quote_Amount")]
+
+def clean(text): return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+def card_fields(data):
+    """The printable part of a row as a hashable tuple: ((label, text), ...), notes. Used as the cache key."""
+    lines = []
+    for label, key in CARD_FIELDS:
+        val = data.get(key, "")
+        if val and str(val).strip() != "" and str(val) != "NaT":
+            lines.append((label, clean(val)))
+    notes = data.get("Notes")
+    return tuple(lines), clean(notes) if notes else ""
+
+@lru_cache(maxsize=1)
+def template_image():
+    """fpdf's parsed form of the template, read once per process and shared by every card."""
+    return FPDF()._parsejpg(TEMPLATE)
+
+def _draw_card(pdf, fields):
+    lines, notes = fields
+    pdf.add_page()
+    if os.path.exists(TEMPLATE):
+        try:
+            pdf.images.setdefault(TEMPLATE, dict(template_image(), i=len(pdf.images) + 1))
+            pdf.image(TEMPLATE, x=0, y=0, w=210)
+            pdf.set_y(50)
+        except:
+            pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "UELCO SERVICES", ln=True, align='C')
+    else:
+        pdf.set_font("Arial", 'B', 16); pdf.cell(0, 10, "UELCO SERVICES - JOB CARD", ln=True, align='C'); pdf.ln(10)
+
+    pdf.set_font("Arial", 'B', 12); pdf.set_fill_color(230, 230, 230); pdf.cell(0, 8, "  JOB CARD DETAILS", ln=True, fill=True); pdf.ln(5)
+    pdf.set_font("Arial", size=10)
+
+    for label, text in lines:
+        pdf.set_font("Arial", 'B', 10); pdf.cell(40, 7, f"{label}:", border=0)
+        pdf.set_font("Arial", size=10); pdf.cell(0, 7, text, border=0, ln=1)
+
+    if notes:
+        pdf.ln(5); pdf.set_font("Arial", 'B', 10); pdf.cell(0, 8, "Notes:", ln=True, fill=True)
+        pdf.set_font("Arial", size=10); pdf.multi_cell(0, 6, notes, border=0)
+
+    if pdf.get_y() < 220: pdf.set_y(220)
+    pdf.ln(5); pdf.set_font("Arial", 'B', 10)
+    pdf.cell(80, 5, "Technician Signature", 0, 0); pdf.cell(30, 5, ""); pdf.cell(80, 5, "Client Signature", 0, 1)
+    pdf.ln(10); pdf.cell(80, 0, "", "B"); pdf.cell(30, 0, ""); pdf.cell(80, 0, "", "B", 1)
+
+def _card_pdf(fields):
+    pdf = FPDF()
+    _draw_card(pdf, fields)
+    return pdf.output(dest='S').encode('latin-1')
+
+# Every card embeds the template (~128 KB), so only the few open in edit panels are kept
+@lru_cache(maxsize=16)
+def _render(fields):
+    return _card_pdf(fields)
+
+def create_job_card(data):
+    """Single job card PDF; identical rows come straight from the cache."""
+    with span("job_card") as trace:
+        pdf = _render(card_fields(data))
+        trace["bytes"] = len(pdf)
+    return pdf
+
+def export_job_cards(rows, as_zip=False, progress=None):
+    """Renders cards for many rows: one multi-page PDF, or a ZIP of single cards. The cards are not cached,
+    so an export does not push the edit panels' cards out of the cache.
+
+    `rows` is a list of (name, row dict); `progress(done, total)` is called after each card."""
+    with span("job_cards.export", rows=len(rows), zip=as_zip) as trace:
+        out = _export(rows, as_zip, progress)
+        trace["bytes"] = len(out)
+    return out
+
+def _export(rows, as_zip, progress):
+    total = len(rows)
+    if not as_zip:
+        pdf = FPDF()
+        for i, (_, data) in enumerate(rows, 1):
+            _draw_card(pdf, card_fields(data))
+            if progress: progress(i, total)
+        return pdf.output(dest='S').encode('latin-1')
+
+    # One card at a time: FPDF is pure Python, so a thread pool only contends for the GIL
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, (name, data) in enumerate(rows, 1):
+            zf.writestr(f"{name}.pdf", _card_pdf(card_fields(data)))
+            if progress: progress(i, total)
+    return buf.getvalue()
@@ -0,0 +1,181 @@
+import argparse
+import re
+import sys
+from contextlib import nullcontext
+import pandas as pd
+from schema import COLUMNS, DATE_FMT, CATEGORIES, ID_COL, VERSION_COL, normalize, sheet_columns
+from sheet_sync import to_sheet_values
+
+# Columns an import can fill; Job_ID and Version are given by the job store, as imported rows are always new jobs
+IMPORT_COLS = [c for c in COLUMNS if c not in (ID_COL, VERSION_COL)]
+
+# Other headers seen in old job spreadsheets, compared like column names (lower case, letters and digits only)
+ALIASES = {
+    "client": "Client_Name", "customer": "Client_Name", "name": "Client_Name",
+    "contact": "Client_Contact", "phone": "Client_Contact", "cell": "Client_Contact", "tel": "Client_Contact", "number": "Client_Contact",
+    "service": "Service_Type", "work": "Service_Type", "workrequired": "Service_Type",
+    "done": "Completed", "complete": "Completed", "inv": "Invoiced",
+    "place": "Place_Received", "quote": "Quote_Amount", "amount": "Quote_Amount", "tech": "Technician",
+    "recv": "Date_Received", "received": "Date_Received", "sentpt": "Date_Sent_To_PT", "backpt": "Date_Back_From_PT", "pickup": "Date_Client_Pickup",
+    "file": "Photo_Link", "files": "Photo_Link", "photo": "Photo_Link", "drive": "OneDrive_Link", "onedrive": "OneDrive_Link",
+}
+
+_YES, _NO = ["TRUE", "YES", "Y", "1", "X"], ["", "FALSE", "NO", "N", "0"]
+_PHONE = r"^\+?[\d\s()./-]+$"
+
+def _key(name):
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+def read_table(file, name=None):
+    """Reads a CSV or Excel file (path or upload) with every cell as found: CSV cells as text, so leading zeros survive."""
+    name = str(name or getattr(file, "name", file)).lower()
+    if name.endswith((".xlsx", ".xlsm", ".xls")):
+        return pd.read_excel(file, dtype=object)
+    try:
+        return pd.read_csv(file, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    except UnicodeDecodeError:
+        # Saved from Excel on Windows
+        if hasattr(file, "seek"): file.seek(0)
+        return pd.read_csv(file, dtype=str, keep_default_na=False, encoding="cp1252")
+
+def map_columns(raw):
+    """Matches source headers to job columns by name (ignoring case, spaces and punctuation) or by ALIASES.
+    Returns (frame of the matched columns under their job names, {source: column}, unmatched source headers)."""
+    known = ALIASES | {_key(c): c for c in IMPORT_COLS}
+    mapping, unmatched = {}, []
+    for src in raw.columns:
+        col = known.get(_key(src))
+        if col and col not in mapping.values(): mapping[src] = col
+        else: unmatched.append(src)
+    return raw[list(mapping)].rename(columns=mapping), mapping, unmatched
+
+def _cells(s):
+    """Source cells as stripped text, blanks as "" (Excel hands back whole numbers as 123.0)."""
+    text = s.where(s.notna(), "").astype(str).str.strip()
+    return text if pd.api.types.is_string_dtype(s) else text.str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+
+def normalize_phones(s):
+    """Phone-shaped cells as digits only: SA numbers as 0XXXXXXXXX (also those typed as 27... or that lost their 0
+    in Excel), others as +digits. Returns (phones, mask of non-blank cells that are not a phone number)."""
+    digits = s.str.replace(r"\D+", "", regex=True)
+    ok = s.str.match(_PHONE) & digits.str.len().between(9, 15)
+    local = digits.where(digits.str.len() != 9, "0" + digits).str.replace(r"^27(\d{9})$", r"0\1", regex=True)
+    phones = local.where(local.str.startswith("0"), "+" + local).where(ok, s)
+    return phones, (s != "") & ~ok
+
+def validate(mapped, default_category=None, dayfirst=True):
+    """Normalizes mapped rows (see map_columns) into job-table types and checks them, one whole-column pass per check.
+
+    Blank categories become `default_category`; dates are read as DATE_FMT, then day-first unless dayfirst=False.
+    Returns (jobs, problems): the valid rows normalized, and one row per problem (Row as numbered in the source
+    file, Column, Value, Problem). Rows with a problem are left out of jobs."""
+    cells = mapped.apply(_cells).reindex(columns=IMPORT_COLS, fill_value="")
+    cells = cells[(cells != "").any(axis=1)]
+    df = cells.copy()
+    bad = []
+
+    def check(mask, col, problem):
+        if mask.any(): bad.append(pd.DataFrame({"Row": cells.index[mask] + 2, "Column": col, "Value": cells.loc[mask, col], "Problem": problem}))
+
+    for col, kind in COLUMNS.items():
+        if col not in df.columns: continue
+        s = cells[col]
+        if kind == "date":
+            parsed = pd.to_datetime(s, format=DATE_FMT, errors="coerce")
+            rest = parsed.isna() & (s != "")
+            if rest.any(): parsed[rest] = pd.to_datetime(s[rest], format="mixed", dayfirst=dayfirst, errors="coerce")
+            df[col] = parsed
+            check(parsed.isna() & (s != ""), col, "not a date")
+        elif kind == "bool":
+            upper = s.str.upper()
+            df[col] = upper.isin(_YES)
+            check(~upper.isin(_YES + _NO), col, "not yes/no")
+
+    df["Client_Contact"], wrong = normalize_phones(cells["Client_Contact"])
+    check(wrong, "Client_Contact", "not a phone number")
+    check(cells["Client_Name"] == "", "Client_Name", "no client name")
+    names = {c.lower(): c for c in CATEGORIES}
+    category = cells["Category"].where(cells["Category"] != "", default_category or "").str.lower().map(names)
+    df["Category"] = category
+    check(category.isna(), "Category", "unknown category")
+    # Service_Type must be one its category offers (any case; stored as CATEGORIES spells it)
+    offered = {f"{c}|{s.lower()}": s for c, services in CATEGORIES.items() for s in services}
+    typed = cells["Service_Type"]
+    service = (category.fillna("") + "|" + typed.str.lower()).map(offered)
+    df["Service_Type"] = service.where(service.notna(), typed)
+    for name in CATEGORIES:
+        check((category == name) & (typed != "") & service.isna(), "Service_Type", f"not a {name} service")
+
+    problems = pd.concat(bad, ignore_index=True).sort_values("Row", kind="stable") if bad else pd.DataFrame(columns=["Row", "Column", "Value", "Problem"])
+    jobs = normalize(df[~df.index.isin(problems["Row"] - 2)].reset_index(drop=True))
+    return jobs, problems
+
+def export_csv(df, chunk_rows=5000):
+    """The jobs in `df` as CSV in sheet format, yielded a chunk of rows at a time (the header first)."""
+    yield ",".join(sheet_columns(df)) + "\n"
+    for start in range(0, len(df), chunk_rows):
+        yield to_sheet_values(df.iloc[start:start + chunk_rows]).to_csv(index=False, header=False)
+
+# --- COMMAND LINE ---
+# Imports and exports without the app, against the sheet in .streamlit/secrets.toml:
+#   python job_io.py import old_faults.xlsx --category "Cable Faults"
+#   python job_io.py export jobs.csv --category "Transformer Servicing" --jobs current
+
+def _connection():
+    import streamlit as st
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection("gsheets", type=GSheetsConnection)
+
+def _store(journal):
+    """A job store writing through its own journal: the app's worker would otherwise flush the same entries at the
+    same time as ours, and both could append a new job before either sees it on the sheet."""
+    from job_store import JobStore
+    from write_queue import WriteQueue
+    conn = _connection()
+    store = JobStore(conn, WriteQueue(journal, conn))
+    store.load()
+    return store
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import or export of jobs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="add the jobs in a CSV or Excel file")
+    imp.add_argument("file")
+    imp.add_argument("--category", choices=list(CATEGORIES), help="for rows without one")
+    imp.add_argument("--month-first", action="store_true", help="read 03/04/2024 as March 4th")
+    imp.add_argument("--problems", help="write the rejected rows' problems to this CSV")
+    imp.add_argument("--dry-run", action="store_true", help="check the file without saving")
+    imp.add_argument("--journal", default="import_writes.db", help="write journal of imports (not the app's)")
+    exp = sub.add_parser("export", help="write jobs as CSV")
+    exp.add_argument("file", help="'-' for stdout")
+    exp.add_argument("--category", choices=list(CATEGORIES))
+    exp.add_argument("--jobs", choices=["current", "old", "all"], default="all", help="current: not completed, old: completed")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        mapped, mapping, unmatched = map_columns(read_table(args.file))
+        jobs, problems = validate(mapped, args.category, dayfirst=not args.month_first)
+        print(f"Columns: {', '.join(f'{s} -> {c}' for s, c in mapping.items() if s != c) or 'all by name'}; ignored: {', '.join(map(str, unmatched)) or 'none'}", file=sys.stderr)
+        if len(problems):
+            print(f"{len(problems)} problem(s) in {problems['Row'].nunique()} row(s), left out:", file=sys.stderr)
+            print(problems.head(20).to_string(index=False), file=sys.stderr)
+            if args.problems: problems.to_csv(args.problems, index=False)
+        if args.dry_run or jobs.empty:
+            print(f"{len(jobs)} job(s) valid, nothing saved", file=sys.stderr)
+            return 1 if len(problems) else 0
+        store = _store(args.journal)
+        store.commit(added=jobs.drop(columns=[ID_COL, VERSION_COL]).to_dict("records"))
+        sent = store.queue.drain(timeout=300)
+        print(f"Imported {len(jobs)} job(s){'' if sent else f'; still queued in {args.journal}, the next import sends them first'}", file=sys.stderr)
+        return 1 if len(problems) else 0
+
+    # Read-only: straight from the sheet, without a store (whose load could queue a repair) or a journal
+    df = normalize(_connection().read(worksheet="Sheet1", ttl=0).dropna(how='all'))
+    if args.category: df = df[df["Category"] == args.category]
+    if args.jobs != "all": df = df[df["Completed"] == (args.jobs == "old")]
+    with nullcontext(sys.stdout) if args.file == "-" else open(args.file, "w", newline="", encoding="utf-8") as f:
+        for chunk in export_csv(df): f.write(chunk)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import threading
+import time
+import pandas as pd
+from gspread.exceptions import WorksheetNotFound
+from schema import EXPECTED_COLS, DATE_COLS, ID_COL, VERSION_COL, normalize, set_values, concat, new_ids, has_ids, sheet_columns
+from search_index import SearchIndex
+from kpis import row_facts, tally, combine
+from sheet_sync import open_worksheet, remote_stamp, to_sheet_values, compute_delta, plan_changes, plan_rewrite, apply_ops
+from tracing import span
+
+class JobStore:
+    """The job table, held once per process and shared by every session.
+
+    Sessions only read `df` and hand their edits to commit(), which applies them to a copy under a
+    lock, journals the sheet operations and swaps the new frame in, so a session mid-render keeps a
+    consistent frame. Copies are shallow: pandas' copy-on-write duplicates only the touched columns.
+    The sheet is read once, and again only when its change stamp moves or a conflict is resolved;
+    a re-read merges other people's changes with our pending ones.
+
+    Rows are indexed by their Job_ID. Each saved row gets a new Version, and the writer only applies
+    a change if the sheet row still has the Version it was based on (see sheet_sync.place_ops).
+
+    The search index is built in the background after the first load and dashboard totals (kpis()) are
+    tallied on first use; commit() then swaps the changed rows out of both and back in, and a reload
+    carries both over by the rows that changed.
+
+    Closed jobs can be moved to an archive worksheet (archive_closed()); it is only read, read-only,
+    when a session asks for history (archive(), search(..., archived=True))."""
+
+    def __init__(self, conn, queue, ws=None, worksheet="Sheet1", sync_mode="delta", search_fields=None, archive_worksheet=None):
+        self.conn, self.queue, self.worksheet = conn, queue, worksheet
+        self._ws = ws          # the worksheet, opened on first use (see ws)
+        self.archive_worksheet = archive_worksheet
+        self.sync_mode, self.search_fields = sync_mode, search_fields or {}
+        self.df = pd.DataFrame()
+        self.synced = None     # sheet values once the queue drains
+        self.stamp = None      # sheet stamp of the last read
+        self.version = 0       # bumped on every load and commit; 0 until the first load
+        self._index = None     # search index, built in the background after a load (see _build_index)
+        self._builder = None
+        self._kpis = None      # kpis.tally of the table, built on first use after a load and kept current by commit()
+        self._archive = None   # the archive worksheet's jobs, read on first use (see _read_archive)
+        self._archive_index = None  # (archive frame, its search index), built on the first archived search
+        self._archive_kpis = None  # kpis.tally of the archive, kept across loads (see kpis())
+        self._archive_drops = 0    # bumped whenever _archive is dropped, so a read that overlapped it starts over
+        self._lock = threading.RLock()
+
+    @property
+    def ws(self):
+        """The gspread worksheet for change stamps, opened on first use: opening it is a network call, so a sheet
+        that cannot be reached fails the load or refresh that needed it, not the store's construction."""
+        if self._ws is None: self._ws = open_worksheet(self.conn, self.worksheet)
+        return self._ws
+
+    def load(self, force=True):
+        """(Re)reads the sheet for every session, with writes still waiting in the queue replayed on top.
+        Returns False if force=False and the table was already loaded."""
+        with self._lock:
+            if not force and self.version: return False
+            with span("load") as trace:
+                # Stamp first: an edit landing during the read shows up as a change on the next check. Pending
+                # writes before the read too: one flushed meanwhile is then replayed (harmlessly) rather than missed
+                stamp = remote_stamp(self.ws)
+                pending = self.queue.entries()
+                with span("sheet.read") as read:
+                    df = self.conn.read(worksheet=self.worksheet, ttl=0).dropna(how='all')
+                    read.update(rows=len(df), bytes=int(df.memory_usage(deep=True).sum()))
+                complete = all(c in df.columns for c in EXPECTED_COLS)
+                df = normalize(df)
+                # Rows without a unique Job_ID (a sheet from before IDs, or rows pasted by hand) get one now
+                missing = (df[ID_COL] == "") | df[ID_COL].duplicated()
+                if missing.any(): df.loc[missing, ID_COL] = new_ids(missing.sum())
+                df.index = df[ID_COL].tolist()
+
+                if pending:
+                    df = normalize(apply_ops(to_sheet_values(df), pending))
+                self.queue.rebase(stamp)
+                before, old = self.df, self.synced
+                self.df, self.stamp = df, stamp
+                self._drop_archive()
+                self.synced = to_sheet_values(df)
+                self._carry_over(before, old)
+                if not complete or missing.any():
+                    # Store repaired columns and new IDs straight away, before anyone saves by ID
+                    self.queue.put(plan_rewrite(self.synced))
+                self.version += 1
+                trace.update(rows=len(df), pending=len(pending))
+            if self._index is None and self.search_fields:
+                self._builder = threading.Thread(target=self._build_index, name="search-index", daemon=True)
+                self._builder.start()
+            return True
+
+    def _carry_over(self, before, old):
+        """Brings the search index and dashboard totals from the table as it was (`before`, sheet values `old`)
+        to the one just loaded, by the rows that changed, instead of dropping them for a full rebuild."""
+        index, totals = self._index, self._kpis
+        self._index = self._kpis = None
+        if old is None or list(old.columns) != list(self.synced.columns) or (index is None and totals is None): return
+        with span("load.carry_over") as trace:
+            inserted, changed, deleted = compute_delta(old, self.synced)
+            gone, now = deleted.append(changed), inserted.append(changed)
+            if index is not None:
+                index.remove(old.loc[gone])
+                index.add(self.synced.loc[now])
+                self._index = index
+            if totals is not None:
+                self._kpis = combine(combine(totals, tally(row_facts(before.loc[gone])), -1), tally(row_facts(self.df.loc[now])))
+            trace["rows"] = len(gone) + len(inserted)
+
+    def _build_index(self):
+        """Builds the search index from a snapshot of the table without holding the lock, so sessions keep
+        working meanwhile (load() runs this on a background thread), then applies what changed since."""
+        while True:
+            with self._lock:
+                if self._index is not None: return self._index
+                snapshot = self.synced
+            with span("search.index", rows=len(snapshot)):
+                index = SearchIndex.build(snapshot, self.search_fields)
+            with self._lock:
+                if self._index is not None: return self._index
+                if list(snapshot.columns) != list(self.synced.columns): continue  # rewritten meanwhile: start over
+                inserted, changed, deleted = compute_delta(snapshot, self.synced)
+                index.remove(snapshot.loc[deleted.append(changed)])
+                index.add(self.synced.loc[inserted.append(changed)])
+                self._index = index
+                return index
+
+    def stale(self):
+        """True if the sheet changed since our last read or write (one small request for its change stamp)."""
+        return remote_stamp(self.ws) not in (self.stamp, self.queue.stamp)
+
+    def refresh(self):
+        """Flushes pending writes now, or reloads if the sheet changed since our last read or write. True if reloaded."""
+        if self.queue.pending():
+            self.queue.flush_now()
+        elif self.stale():
+            return self.load()
+        return False
+
+    def resolve(self, keep_local, ids=None):
+        """Settles write conflicts (all, or those of `ids`): our rows go over the sheet's, or are dropped for the
+        sheet's. Either way the table is re-read so it shows the outcome."""
+        with self._lock:
+            self.queue.resolve(keep_local, ids)
+            self.load()
+
+    def search(self, query, archived=False):
+        """Labels matching `query` (see SearchIndex.search) in the table, or in archive() with archived=True.
+        The index is built in the background after the first load (a search meanwhile waits for it), kept
+        current by commit() and carried over reloads."""
+        with span("search", archived=archived) as trace:
+            if archived:
+                found = set(self._archive_search().search(query))
+            else:
+                builder = self._builder
+                if builder is not None: builder.join()
+                index = self._index or self._build_index()
+                with self._lock: found = set(index.search(query))
+            trace["rows"] = len(found)
+            return found
+
+    def kpis(self, archived=False):
+        """The dashboard totals (see kpis.tally) of the table, plus those of the archive with archived=True.
+
+        The archive's totals are tallied when it is read and kept across loads: archive_closed() moves the
+        tally of the jobs it archives over to them, and only another process's moves wait for the next read."""
+        if archived and self._archive_kpis is None: self._read_archive()
+        with self._lock:
+            if self._kpis is None:
+                with span("kpis", rows=len(self.df)):
+                    self._kpis = tally(row_facts(self.df))
+            if not archived: return self._kpis
+            return combine(self._kpis, self._archive_kpis)
+
+    def archive(self):
+        """The archived jobs (an empty table if there is no archive yet), read on first use after a load."""
+        return self._read_archive()
+
+    def _drop_archive(self):
+        self._archive = None
+        self._archive_drops += 1
+
+    def _read_archive(self):
+        """Reads and tallies the archive without holding the lock (it can be years of jobs), so other sessions
+        keep saving meanwhile, then swaps it in; a read overlapped by a load or an archive move starts over."""
+        while True:
+            with self._lock:
+                if self._archive is not None: return self._archive
+                drops, hot = self._archive_drops, self.df.index
+            with span("archive.read") as trace:
+                try:
+                    df = self.conn.read(worksheet=self.archive_worksheet, ttl=0).dropna(how='all') if self.archive_worksheet else pd.DataFrame()
+                except WorksheetNotFound:
+                    df = pd.DataFrame()
+                # Rows on their way to the archive are already gone from the table: show them here meanwhile
+                moving = [pd.DataFrame(op["values"], columns=op["columns"]) for op in self.queue.entries() if op["op"] == "archive" and op["worksheet"] == self.archive_worksheet]
+                df = normalize(pd.concat([df, *moving], ignore_index=True) if moving else df.reset_index(drop=True))
+                # A job whose delete from the table conflicted is in both; count it once
+                totals = tally(row_facts(df[~has_ids(df[ID_COL], hot)]))
+                trace["rows"] = len(df)
+            with self._lock:
+                if self._archive_drops != drops: continue
+                self._archive, self._archive_kpis = df, totals
+                return df
+
+    def _archive_search(self):
+        """The archive's search index, built on the first archived search after a read (outside the lock too)."""
+        df = self._read_archive()
+        built = self._archive_index
+        if built is None or built[0] is not df:
+            with span("search.index", rows=len(df), archived=True):
+                built = df, SearchIndex.build(to_sheet_values(df), self.search_fields)
+            self._archive_index = built
+        return built[1]
+
+    def archive_closed(self, before):
+        """Moves closed jobs (Completed and Invoiced) whose latest date is before `before` to the archive
+        worksheet, as one journal entry: archive append, then delete. Returns how many were moved."""
+        with self._lock:
+            df = self.df
+            if not self.archive_worksheet or df.empty or self.queue.conflict: return 0
+            closed = df.index[df["Completed"] & df["Invoiced"] & (df[DATE_COLS].max(axis=1) < before)]
+            if not len(closed): return 0
+            rows = to_sheet_values(df.loc[closed])
+            if self._archive_kpis is not None: self._archive_kpis = combine(self._archive_kpis, tally(row_facts(df.loc[closed])))
+            self.commit(deleted=closed, extra_ops=[{"op": "archive", "worksheet": self.archive_worksheet, "columns": list(rows.columns), "values": rows.values.tolist()}])
+            self._drop_archive()
+            return len(closed)
+
+    def commit(self, edits=None, deleted=(), added=(), bulk=(), extra_ops=()):
+        """Applies one session's changes and journals them for the background writer.
+
+        `edits` maps label -> {column: value}, `bulk` is a list of (labels, {column: value}) applied to all
+        those rows at once, `deleted` lists labels and `added` row dicts. Rows another session deleted
+        meanwhile are skipped. `extra_ops` are journaled ahead of the table's own.
+        Returns the Job_IDs given to the added rows."""
+        with self._lock, span("commit") as trace:
+            df = self.df.copy(deep=False)
+            dirty = set()
+            for label, values in (edits or {}).items():
+                if label in df.index:
+                    set_values(df, label, values)
+                    dirty.add(label)
+            for labels, values in bulk:
+                labels = [label for label in labels if label in df.index]
+                if labels:
+                    set_values(df, labels, values)
+                    dirty.update(labels)
+            gone = [label for label in deleted if label in df.index]
+            if gone:
+                df = df.drop(gone)
+                dirty.update(gone)
+            ids = new_ids(len(added))
+            if added:
+                new = normalize(pd.DataFrame(list(added), index=ids))
+                new[ID_COL] = ids
+                df = concat([df, new])
+                dirty.update(ids)
+            trace["rows"] = len(dirty)
+            if not dirty: return ids
+
+            synced, index = self.synced, self._index
+            current = to_sheet_values(df.loc[df.index[has_ids(df.index, dirty)]])
+            inserted, changed, removed = delta = compute_delta(synced, current, dirty)
+            # Saved rows get a new Version: a millisecond clock that always moves forward, so two
+            # sessions' edits of the same row never end up with the same Version
+            saved = inserted.append(changed)
+            if len(saved):
+                now = int(time.time() * 1000)
+                base = [0] * len(inserted) + synced.loc[changed, VERSION_COL].astype(int).tolist()
+                df.loc[saved, VERSION_COL] = [max(v + 1, now) for v in base]
+                current.loc[saved, VERSION_COL] = df.loc[saved, VERSION_COL].astype(str).values
+            if index is not None:
+                index.remove(synced.loc[removed.append(changed)])
+                index.add(current.loc[saved])
+            if self.sync_mode == "delta" and list(synced.columns) == sheet_columns(df):
+                ops, self.synced = plan_changes(synced, current, delta)
+            else:
+                self.synced = to_sheet_values(df)
+                ops = plan_rewrite(self.synced)
+            if self._kpis is not None:
+                before = self.df.loc[self.df.index[has_ids(self.df.index, dirty)]]
+                self._kpis = combine(combine(self._kpis, tally(row_facts(before)), -1), tally(row_facts(df.loc[current.index])))
+            self.queue.put(list(extra_ops) + ops)
+            self.df = df
+            self.version += 1
+            return ids
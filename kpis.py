@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from schema import CATEGORIES
+
+# Dashboard figures, kept as additive totals: a tally of some rows is a few small count/sum tables, and the
+# tally of a whole table is the sum of the tallies of its parts. The job store tallies the table once, then
+# on every commit subtracts the changed rows' old tally and adds their new one (combine()), so the cost
+# of a save is the rows it touched. Averages are derived from the sums when shown (summary()).
+
+# Transformer PT pipeline: stage -> (start date, end date). Turnaround is counted in the month the stage ended.
+STAGES = {
+    "Received → Sent to PT": ("Date_Received", "Date_Sent_To_PT"),
+    "At PT": ("Date_Sent_To_PT", "Date_Back_From_PT"),
+    "Back → Picked up": ("Date_Back_From_PT", "Date_Client_Pickup"),
+    "Received → Picked up": ("Date_Received", "Date_Client_Pickup"),
+}
+# Where an open transformer job is waiting, by the last PT date filled in
+WAITING = ["Awaiting PT", "At PT", "Awaiting pickup"]
+UNASSIGNED = "(unassigned)"
+
+def quote_values(s):
+    """Quote_Amount as typed ("R 1 200", "1,200.50", "1200,50") -> rand, NaN where there is no number."""
+    text = s.astype(str).str.replace(r"[^\d.,-]+", "", regex=True)
+    text = text.str.replace(r",(\d{1,2})$", r".\1", regex=True).str.replace(",", "", regex=False)
+    return pd.to_numeric(text, errors="coerce")
+
+def row_facts(df):
+    """One row of vectorized facts per job of a CATEGORIES tab: who has it, whether it is open or completed but
+    not invoiced, its quote in rand, where it waits in the PT pipeline and how long each stage took."""
+    df = df[df["Category"].isin(list(CATEGORIES))]
+    facts = pd.DataFrame({
+        "Category": df["Category"].astype(str),
+        "Technician": df["Technician"].astype(str).str.strip().replace("", UNASSIGNED),
+        "Open": ~df["Completed"],
+        "Unbilled": df["Completed"] & ~df["Invoiced"],
+        "Quote": quote_values(df["Quote_Amount"]),
+    }, index=df.index)
+    transformer = facts["Open"] & (facts["Category"] == "Transformer Servicing")
+    facts["Waiting"] = np.select(
+        [transformer & df["Date_Back_From_PT"].notna(), transformer & df["Date_Sent_To_PT"].notna(), transformer],
+        WAITING[::-1], "")
+    for stage, (start, end) in STAGES.items():
+        days = (df[end] - df[start]).dt.days
+        facts[stage] = days.where(days >= 0)  # a stage that ends before it starts is a typo, not a turnaround
+        facts[f"{stage} month"] = df[end].dt.to_period("M").where(days >= 0)
+    return facts
+
+def tally(facts):
+    """The additive totals of `facts` (see row_facts()): open jobs per category and technician, open transformer
+    jobs per PT stage, stage days and counts per month, and completed-but-not-invoiced jobs and quotes per category."""
+    open_jobs, unbilled = facts[facts["Open"]], facts[facts["Unbilled"]]
+    turnaround = pd.concat([
+        facts.groupby(f"{stage} month")[stage].agg(Jobs="count", Days="sum").rename_axis("Month").assign(Stage=stage).set_index("Stage", append=True)
+        for stage in STAGES])
+    return {
+        "backlog": open_jobs.groupby(["Technician", "Category"]).size().to_frame("Jobs"),
+        "waiting": open_jobs[open_jobs["Waiting"] != ""].groupby("Waiting").size().to_frame("Jobs"),
+        "turnaround": turnaround,
+        "unbilled": unbilled.groupby("Category").agg(Jobs=("Quote", "size"), Priced=("Quote", "count"), Value=("Quote", "sum")),
+    }
+
+def combine(totals, other, sign=1):
+    """totals + other (sign=1) or totals - other (sign=-1), leaving out groups that fall to zero."""
+    out = {}
+    for name, t in totals.items():
+        t = t.add(other[name] * sign, fill_value=0)
+        out[name] = t[(t.round(6) != 0).any(axis=1)]
+    return out
+
+def summary(totals, months=None):
+    """The totals as the dashboard shows them; turnaround only for the `months` (Periods) given, else all of them."""
+    turnaround = totals["turnaround"]
+    if months is not None: turnaround = turnaround[turnaround.index.get_level_values("Month").isin(months)]
+    stages = turnaround.groupby(level="Stage").sum().reindex(list(STAGES)).fillna(0)
+    monthly = (turnaround["Days"] / turnaround["Jobs"]).unstack("Stage").reindex(columns=list(STAGES)).sort_index()
+    backlog = totals["backlog"]["Jobs"].unstack("Category", fill_value=0).reindex(columns=list(CATEGORIES), fill_value=0).astype(int)
+    backlog["Total"] = backlog.sum(axis=1)
+    unbilled = totals["unbilled"].reindex(list(CATEGORIES)).fillna(0)
+    return {
+        "open": int(backlog["Total"].sum()),
+        "waiting": totals["waiting"]["Jobs"].reindex(WAITING, fill_value=0).astype(int),
+        "turnaround": pd.DataFrame({"Jobs": stages["Jobs"].astype(int), "Avg days": (stages["Days"] / stages["Jobs"]).round(1)}),
+        "monthly": monthly.set_axis(monthly.index.astype(str)),
+        "backlog": backlog.sort_values("Total", ascending=False),
+        "unbilled": pd.DataFrame({"Jobs": unbilled["Jobs"].astype(int), "No quote": (unbilled["Jobs"] - unbilled["Priced"]).astype(int), "Value (R)": unbilled["Value"].round(2)}),
+    }
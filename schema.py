@@ -0,0 +1,132 @@
+import uuid
+import pandas as pd
+
+DATE_FMT = '%Y-%m-%d'
+
+# The job table, column -> kind. "category" columns repeat a handful of values and are stored as
+# pandas categoricals (each value once, a small code per row); "text" is free text. Blank text and
+# category cells hold "", blank dates NaT. Job_ID and Version are managed by the job store, not edited.
+COLUMNS = {
+    "Date": "date", "Date_Received": "date", "Date_Sent_To_PT": "date", "Date_Back_From_PT": "date", "Date_Client_Pickup": "date",
+    "Completed": "bool", "Invoiced": "bool",
+    "Client_Name": "text", "Client_Contact": "text", "Service_Type": "category", "Notes": "text", "Location": "text",
+    "Place_Received": "category", "Quote_Amount": "text", "Technician": "category", "Category": "category",
+    "Photo_Link": "text", "OneDrive_Link": "text",
+    "Job_ID": "text", "Version": "int",
+}
+EXPECTED_COLS = list(COLUMNS)
+DATE_COLS = [c for c, kind in COLUMNS.items() if kind == "date"]
+BOOL_COLS = [c for c, kind in COLUMNS.items() if kind == "bool"]
+CATEGORY_COLS = [c for c, kind in COLUMNS.items() if kind == "category"]
+ID_COL, VERSION_COL = "Job_ID", "Version"  # stable row identity, and a counter bumped on every saved change
+
+# Category -> the Service_Type options offered for it; each category is one tab of the app
+CATEGORIES = {
+    "Sales & Install": ["Order", "Order + Delivery", "Order + Installation", "Quoted", "To Quote"],
+    "Transformer Servicing": ["Oil Change", "Gasket Replacement", "General Service", "Testing", "Quoted", "To Quote"],
+    "Cable Faults": ["Thumping/Locating", "Jointing", "Quoted", "To Quote"],
+}
+
+_FALSE = ["", "FALSE", "0", "NO", "NAN", "NONE"]
+
+def phone_digits(phones):
+    """Phone numbers as typed -> international digits only (a local leading 0 becomes SA's 27)."""
+    return phones.astype(str).str.replace(r"\D+", "", regex=True).str.replace(r"^0", "27", regex=True)
+
+def whatsapp_links(phones):
+    digits = phone_digits(phones)
+    return ("https://wa.me/" + digits).where(digits != "", None)
+
+# Derived column -> (source columns, vectorized function of the frame). Computed on load, refreshed
+# by set_values() when a source changes, and never written to the sheet.
+DERIVED = {"WA_Link": (["Client_Contact"], lambda df: whatsapp_links(df["Client_Contact"]))}
+DERIVED_COLS = list(DERIVED)
+
+def _text(s):
+    return s.where(s.notna(), "").astype(str)
+
+def _dates(s):
+    if pd.api.types.is_datetime64_any_dtype(s): return s
+    # Sheet dates are written as DATE_FMT: one fast fixed-format pass, then a flexible one for whatever else was typed
+    parsed = pd.to_datetime(s, format=DATE_FMT, errors='coerce')
+    rest = _text(s[parsed.isna()]).str.strip()
+    rest = rest[rest != ""]
+    if len(rest): parsed[rest.index] = pd.to_datetime(rest, format="mixed", errors='coerce')
+    return parsed
+
+def _ints(s):
+    return pd.to_numeric(s, errors='coerce').fillna(0).astype("int64")
+
+def _bools(s):
+    if pd.api.types.is_bool_dtype(s): return s.fillna(False).astype(bool)
+    return ~_text(s).str.strip().str.upper().isin(_FALSE)
+
+def normalize(df):
+    """Self-Repair: adds missing columns, gives every column its declared dtype and (re)computes the derived columns."""
+    for col in EXPECTED_COLS:
+        if col not in df.columns: df[col] = pd.NA
+    for col, kind in COLUMNS.items():
+        s = df[col]
+        if kind == "date": df[col] = _dates(s)
+        elif kind == "bool": df[col] = _bools(s)
+        elif kind == "int": df[col] = _ints(s)
+        elif kind == "category": df[col] = s if isinstance(s.dtype, pd.CategoricalDtype) else _text(s).astype("category")
+        else: df[col] = _text(s)
+    for col, (_, derive) in DERIVED.items():
+        df[col] = derive(df)
+    return df
+
+def coerce(col, val):
+    """One edited value in its column's type (dates from date objects or strings, "" for blank text)."""
+    kind = COLUMNS.get(col)
+    if kind == "date": return pd.NaT if val is None or val == "" else pd.to_datetime(val, errors='coerce')
+    if kind == "bool": return bool(val)
+    if kind == "int":
+        val = pd.to_numeric(val, errors='coerce')
+        return 0 if pd.isnull(val) else int(val)
+    if kind and (val is None or (not isinstance(val, str) and pd.isnull(val))): return ""
+    return str(val) if kind else val
+
+def changed_values(row, values):
+    """The entries of {column: value} that differ from `row` once coerced to their column's type, so a form
+    saves only the fields it shows that were changed, never a stale copy of the rest of the row."""
+    out = {}
+    for col, val in values.items():
+        new, old = coerce(col, val), row.get(col)
+        same = pd.isnull(new) and pd.isnull(old) if pd.isnull(new) or pd.isnull(old) else new == old
+        if not same: out[col] = val
+    return out
+
+def set_values(df, labels, values):
+    """Writes {column: value} into row `labels` (one label or a list of them) in place, in one assignment per
+    column, extending categories as needed and refreshing derived columns."""
+    labels = labels if pd.api.types.is_list_like(labels) else [labels]
+    for col, val in values.items():
+        if col in DERIVED or col in (ID_COL, VERSION_COL) or col not in df.columns: continue
+        val = coerce(col, val)
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) and val not in s.cat.categories:
+            df[col] = s.cat.add_categories([val])
+        df.loc[labels, col] = val
+    for col, (sources, derive) in DERIVED.items():
+        if any(c in values for c in sources):
+            df.loc[labels, col] = derive(df.loc[labels])
+
+def concat(frames):
+    """pd.concat that keeps the categoricals (pandas falls back to object when the category sets differ)."""
+    cats = {c: pd.api.types.union_categoricals([f[c] for f in frames]).categories for c in CATEGORY_COLS if all(c in f.columns for f in frames)}
+    return pd.concat([f.astype({c: pd.CategoricalDtype(v) for c, v in cats.items()}) for f in frames])
+
+def new_ids(n):
+    """n new Job_IDs. The letter in front keeps Sheets from reading one as a number ("531472377e89" as 5.3E+97,
+    "0123..." without its 0), which would give the job a different ID on the next read."""
+    return ["J" + uuid.uuid4().hex[:11] for _ in range(n)]
+
+def has_ids(index, ids):
+    """index.isin(ids) through a hash table. Job_IDs are Arrow strings, whose isin() checks every one of `ids`
+    in Python (about a second per 100k)."""
+    return pd.Index(index, dtype=object).isin(pd.Index(list(ids), dtype=object))
+
+def sheet_columns(df):
+    """The columns of `df` that are stored in the sheet (everything but the derived ones)."""
+    return [c for c in df.columns if c not in DERIVED]
@@ -0,0 +1,109 @@
+import re
+import numpy as np
+import pandas as pd
+from bisect import bisect_left, insort
+
+_WORD = re.compile(r"[0-9a-z]+")
+
+def tokenize(text):
+    """Lower-cased words, plus the digits run together so phone numbers match however they were typed."""
+    text = str(text).lower()
+    tokens = set(_WORD.findall(text))
+    digits = re.sub(r"\D+", "", text)
+    if len(digits) > 3: tokens.add(digits)
+    return tokens
+
+def _tokenize_column(text):
+    """Vectorized tokenize() over a Series of strings: returns a (label -> token) Series, one row per distinct pair."""
+    text = text.str.lower()
+    words = text.str.findall(_WORD.pattern).explode()
+    digits = text.str.replace(r"\D+", "", regex=True)
+    pairs = pd.concat([words, digits[digits.str.len() > 3]]).dropna()
+    return pairs[~pd.MultiIndex.from_arrays([pairs.index, pairs.values]).duplicated()]
+
+def _groups(keys, values):
+    """(key, array of its values) for each distinct key, from one sort instead of a loop over the pairs."""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    values = values[order]
+    bounds = [0, *(np.flatnonzero(np.diff(codes[order])) + 1).tolist(), len(values)]
+    return ((key, values[a:b]) for key, a, b in zip(uniques, bounds, bounds[1:]))
+
+class SearchIndex:
+    """Inverted index from word tokens to row labels, kept per search field.
+
+    Terms match as word prefixes through a sorted vocabulary, so a lookup is a bisect plus a
+    union of postings instead of a scan over every cell. Rows are added and removed a frame at a
+    time, tokenized a column at a time; a changed row is removed as it was indexed and added as
+    it is now, so the index keeps no per-row state."""
+
+    def __init__(self, fields):
+        self.fields = fields                          # search field -> list of columns, e.g. {"client": ["Client_Name"]}
+        self._postings = {f: {} for f in fields}      # field -> token -> set of labels
+        self._vocab = {f: [] for f in fields}         # field -> sorted tokens
+        self._labels = set()                          # every indexed row, for queries without terms
+
+    @classmethod
+    def build(cls, df, fields):
+        index = cls(fields)
+        index.add(df)
+        return index
+
+    def _pairs(self, df):
+        """(field, tokens, labels) per search field of `df`, one entry per distinct (label, token) pair."""
+        for field, cols in self.fields.items():
+            cols = [c for c in cols if c in df.columns]
+            if not cols or df.empty: continue
+            text = df[cols[0]].str.cat([df[c] for c in cols[1:]], sep=" ") if len(cols) > 1 else df[cols[0]]
+            pairs = _tokenize_column(text)
+            yield field, pairs.to_numpy(dtype=object), pairs.index.to_numpy(dtype=object)
+
+    def add(self, df):
+        """Indexes the rows of `df`, a sheet-values frame (all strings) of rows not indexed yet."""
+        self._labels.update(df.index.tolist())
+        for field, toks, labels in self._pairs(df):
+            postings, vocab = self._postings[field], self._vocab[field]
+            new = []
+            for tok, hits in _groups(toks, labels):
+                if tok not in postings:
+                    postings[tok] = set()
+                    new.append(tok)
+                postings[tok].update(hits)
+            # One sort beats many insorts when (re)building
+            if len(new) > 64: self._vocab[field] = sorted(postings)
+            else:
+                for tok in new: insort(vocab, tok)
+
+    def remove(self, df):
+        """Unindexes the rows of `df`, which holds them with the values they were indexed with."""
+        self._labels.difference_update(df.index.tolist())
+        for field, toks, labels in self._pairs(df):
+            postings, vocab = self._postings[field], self._vocab[field]
+            for tok, hits in _groups(toks, labels):
+                left = postings.get(tok)
+                if left is None: continue
+                left.difference_update(hits)
+                if not left:
+                    del postings[tok]
+                    del vocab[bisect_left(vocab, tok)]
+
+    def _prefix(self, field, tok):
+        """Postings of every token starting with `tok` (not copied, callers must not mutate them)."""
+        vocab, postings = self._vocab[field], self._postings[field]
+        i = j = bisect_left(vocab, tok)
+        while j < len(vocab) and vocab[j].startswith(tok): j += 1
+        return [postings[t] for t in vocab[i:j]]
+
+    def search(self, query):
+        """Labels matching every term of `query`. A term may be scoped as field:value, where any
+        prefix of a field name works (`tech:john`, `loc:midrand`); unscoped terms search all fields."""
+        result = None
+        for term in query.split():
+            scope, sep, value = term.partition(":")
+            fields = [f for f in self.fields if f.startswith(scope.lower())] if sep and scope else list(self.fields)
+            if not sep or not scope: value = term
+            for tok in tokenize(value):
+                sets = [h for field in fields for h in self._prefix(field, tok)]
+                hits = sets[0] if len(sets) == 1 else set().union(*sets)
+                result = hits if result is None else result & hits
+        return result if result is not None else set(self._labels)
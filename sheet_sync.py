@@ -0,0 +1,252 @@
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from itertools import groupby
+from gspread.exceptions import WorksheetNotFound
+from gspread.utils import rowcol_to_a1
+from schema import DATE_FMT, ID_COL, VERSION_COL, has_ids, sheet_columns
+
+# Sheet layout: row 1 is the header, data row at position p (0-based) lives on sheet row p + 2. Rows are
+# identified by their Job_ID column; positions are only looked up when operations are sent.
+HEADER_ROWS = 1
+
+def open_worksheet(conn, name):
+    """Returns the gspread worksheet behind a GSheetsConnection, or None if the client has no row-level access."""
+    select = getattr(conn.client, "_select_worksheet", None)
+    return select(worksheet=name) if select else None
+
+def _cell(v):
+    if isinstance(v, bool): return "TRUE" if v else "FALSE"
+    if isinstance(v, (pd.Timestamp, datetime, date)): return "" if pd.isnull(v) else v.strftime(DATE_FMT)
+    if v is None or (not isinstance(v, str) and pd.isnull(v)): return ""
+    return str(v)
+
+def to_sheet_values(df):
+    """Renders the job table exactly as it is stored in the sheet: every cell a string, blanks for missing values, no derived columns."""
+    out = {}
+    cols = sheet_columns(df)
+    for col in cols:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            out[col] = s.dt.strftime(DATE_FMT).fillna("")
+        elif pd.api.types.is_bool_dtype(s):
+            out[col] = s.map({True: "TRUE", False: "FALSE"})
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            out[col] = s.astype(str).where(s.notna(), "")
+        elif pd.api.types.is_string_dtype(s) and not pd.api.types.is_object_dtype(s):
+            out[col] = s.fillna("")
+        else:
+            out[col] = s.map(_cell)
+    return pd.DataFrame(out, index=df.index, columns=cols)
+
+def compute_delta(synced, current, dirty=None):
+    """Returns the (inserted, changed, deleted) index labels of `current` relative to the last synced snapshot.
+
+    With `dirty` labels only those rows are compared, and `current` need only hold the dirty rows still present."""
+    if dirty is None:
+        deleted = synced.index[~has_ids(synced.index, current.index)]
+    else:
+        dirty = pd.Index(dirty)
+        deleted = dirty[has_ids(dirty, synced.index) & ~has_ids(dirty, current.index)]
+    known = has_ids(current.index, synced.index)
+    inserted = current.index[~known]
+    common = current.index[known]
+    # A reload usually has the same rows in the same order: no reindexing then
+    new = current if common.equals(current.index) else current.loc[common]
+    old = synced if common.equals(synced.index) else synced.loc[common]
+    differs = np.zeros(len(common), dtype=bool)
+    for col in synced.columns:
+        differs |= np.asarray(new[col].array != old[col].array)  # column by column, on the Arrow strings
+    return inserted, common[differs], deleted
+
+def _runs(positions):
+    """Groups sorted 0-based positions into contiguous (start, end) runs."""
+    runs = []
+    for p in sorted(positions):
+        if runs and p == runs[-1][1] + 1: runs[-1][1] = p
+        else: runs.append([p, p])
+    return runs
+
+# --- OPERATIONS ---
+# A save is planned as a list of JSON-able operations on rows identified by Job_ID, so it can be journaled,
+# replayed on a fresh read and sent later. Rows are only placed on sheet positions when sent (place_ops):
+#   {"op": "put", "columns": [...], "rows": [[...], ...], "base": [v, ...]}   update a row still at Version v, or insert (v = null)
+#   {"op": "delete", "ids": [...], "base": [v, ...]}
+#   {"op": "rewrite", "columns": [...], "values": [[...], ...]}               unconditional, e.g. to add IDs to an old sheet
+#   {"op": "archive", "worksheet": name, "columns": [...], "values": [[...], ...]}
+#                                                           appends to another worksheet (created if missing)
+ROW_OPS = ("put", "delete")
+
+def plan_rewrite(current):
+    return [{"op": "rewrite", "columns": list(current.columns), "values": current.values.tolist()}]
+
+def plan_changes(synced, current, delta):
+    """Plans the row operations for `delta` (see compute_delta). `current` holds the changed and inserted rows
+    with their new Version, `synced` the versions the sheet had. Returns (ops, new_snapshot)."""
+    inserted, changed, deleted = delta
+    ops = []
+    if len(deleted):
+        ops.append({"op": "delete", "ids": list(deleted), "base": synced.loc[deleted, VERSION_COL].astype(int).tolist()})
+    rows = inserted.append(changed)
+    if len(rows):
+        base = [None] * len(inserted) + synced.loc[changed, VERSION_COL].astype(int).tolist()
+        ops.append({"op": "put", "columns": list(current.columns), "rows": current.loc[rows].values.tolist(), "base": base})
+
+    snapshot = synced.drop(deleted)
+    if len(changed): snapshot.loc[changed] = current.loc[changed, snapshot.columns].values
+    return ops, pd.concat([snapshot, current.loc[inserted, snapshot.columns]]) if len(inserted) else snapshot
+
+def coalesce(ops):
+    """A rewrite supersedes every operation before it except archive appends, which go to another worksheet."""
+    rewrites = [i for i, op in enumerate(ops) if op["op"] == "rewrite"]
+    start = rewrites[-1] if rewrites else 0
+    return [op for op in ops[:start] if op["op"] == "archive"] + ops[start:]
+
+def _version(v):
+    try: return int(v)
+    except (TypeError, ValueError): return 0
+
+def place_ops(ops, ids, versions):
+    """Places row operations on the sheet as it is now, given its Job_ID and Version columns (data rows in order).
+
+    Returns (updates {position: (columns, row)}, deleted positions, appended (columns, row) pairs, conflicts), each
+    row with the columns of the op it came from (see _on_header). A row conflicts when its sheet
+    Version is no longer the one the edit was based on, or it was deleted there (a put whose own new Version is
+    already on the sheet was sent before and is skipped); conflicts are
+    {"id", "op", "columns", "row", "remote"} with the sheet's version (None if deleted) and are not sent."""
+    pos = {}
+    for p, jid in enumerate(ids):
+        if jid: pos.setdefault(jid, p)
+    ver = {jid: _version(v) for jid, v in zip(ids, versions)}
+    updates, deleted, appended, conflicts = {}, set(), {}, {}
+    for op in ops:
+        if op["op"] == "put":
+            k, vk = op["columns"].index(ID_COL), op["columns"].index(VERSION_COL)
+            for row, base in zip(op["rows"], op["base"]):
+                jid = row[k]
+                if jid in appended:
+                    appended[jid] = op["columns"], row
+                    continue
+                remote = ver[jid] if jid in pos and pos[jid] not in deleted else None
+                if remote is not None and remote == _version(row[vk]) and jid not in conflicts:
+                    continue  # already applied: a batch resent after an interrupted flush
+                if jid in conflicts or remote != base:
+                    conflicts[jid] = {"id": jid, "op": "put", "columns": op["columns"], "row": row, "remote": remote}
+                elif remote is None:
+                    appended[jid] = op["columns"], row
+                else:
+                    updates[pos[jid]] = op["columns"], row
+                    ver[jid] = _version(row[vk])
+        elif op["op"] == "delete":
+            for jid, base in zip(op["ids"], op["base"]):
+                remote = ver[jid] if jid in pos and pos[jid] not in deleted else None
+                if jid in appended:
+                    del appended[jid]
+                elif jid in conflicts or (remote is not None and remote != base):
+                    conflicts[jid] = {"id": jid, "op": "delete", "columns": None, "row": None, "remote": remote}
+                elif remote is not None:
+                    deleted.add(pos[jid])
+                    updates.pop(pos[jid], None)
+    return updates, deleted, list(appended.values()), list(conflicts.values())
+
+def _on_header(columns, row, header):
+    """`row` (values for `columns`) laid out under the sheet's `header`, blank where it has no value."""
+    values = dict(zip(columns, row))
+    return [values.get(c, "") for c in header]
+
+def _send_rows(ws, ops):
+    """Sends a run of row operations: reads the sheet's header and its Job_ID and Version columns, then one
+    request each for updates, deletes and appends. Rows are written under the sheet's own headers, so a column
+    inserted or moved there since we read it is left alone; changed rows only touch the columns they have.
+    Returns the conflicts. Raises LookupError if the sheet has lost its Job_ID or Version column."""
+    header = ws.row_values(HEADER_ROWS)
+    for c in (ID_COL, VERSION_COL):
+        if c not in header: raise LookupError(f"the sheet has no {c} column")
+    letters = [rowcol_to_a1(1, header.index(c) + 1)[:-1] for c in (ID_COL, VERSION_COL)]
+    id_vals, ver_vals = ws.batch_get([f"{c}{HEADER_ROWS + 1}:{c}" for c in letters])
+    ids = [r[0] if r else "" for r in id_vals]
+    versions = [r[0] if r else "" for r in ver_vals] + [""] * max(0, len(id_vals) - len(ver_vals))
+    updates, deleted, appended, conflicts = place_ops(ops, ids, versions)
+
+    if updates:
+        data = []
+        for s, e in _runs(updates):
+            rows = [updates[p] for p in range(s, e + 1)]
+            known = set.intersection(*(set(columns) for columns, _ in rows))
+            values = [_on_header(columns, row, header) for columns, row in rows]
+            for a, b in _runs(i for i, c in enumerate(header) if c in known):
+                data.append({"range": f"{rowcol_to_a1(s + HEADER_ROWS + 1, a + 1)}:{rowcol_to_a1(e + HEADER_ROWS + 1, b + 1)}",
+                             "values": [v[a:b + 1] for v in values]})
+        ws.batch_update(data, value_input_option="USER_ENTERED")
+    if deleted:
+        # Bottom-up, so earlier deletions do not shift later ones
+        ws.spreadsheet.batch_update({"requests": [
+            {"deleteDimension": {"range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": s + HEADER_ROWS, "endIndex": e + HEADER_ROWS + 1}}}
+            for s, e in reversed(_runs(deleted))]})
+    if appended:
+        ws.append_rows([_on_header(columns, row, header) for columns, row in appended], value_input_option="USER_ENTERED", table_range="A1")
+    return conflicts
+
+def send_ops(conn, ws, worksheet, ops):
+    """Sends planned operations to the sheet. Returns the conflicts of the row operations, which were held back."""
+    conflicts = []
+    for is_rows, run in groupby(ops, key=lambda op: op["op"] in ROW_OPS):
+        if is_rows:
+            conflicts += _send_rows(ws, list(run))
+            continue
+        for op in run:
+            if op["op"] == "rewrite":
+                conn.update(worksheet=worksheet, data=pd.DataFrame(op["values"], columns=op["columns"]))
+            elif op["op"] == "archive":
+                rows = pd.DataFrame(op["values"], columns=op["columns"])
+                try:
+                    target = ws.spreadsheet.worksheet(op["worksheet"])
+                except WorksheetNotFound:
+                    conn.create(worksheet=op["worksheet"], data=rows)
+                    continue
+                # Match the archive's own column order; a blank archive gets our header first
+                header = target.row_values(1)
+                if ID_COL in header:
+                    # Skip jobs already archived: by another process that loaded the same rows, or by an earlier
+                    # move whose delete then conflicted and left the row to be archived again
+                    col = rowcol_to_a1(1, header.index(ID_COL) + 1)[:-1]
+                    archived = [r[0] for r in target.batch_get([f"{col}{HEADER_ROWS + 1}:{col}"])[0] if r]
+                    rows = rows[~has_ids(rows[ID_COL], archived)]
+                    if rows.empty: continue
+                values = rows.reindex(columns=header, fill_value="").values.tolist() if header else [op["columns"]] + op["values"]
+                target.append_rows(values, value_input_option="USER_ENTERED", table_range="A1")
+    return conflicts
+
+def force_ops(conflicts):
+    """Operations that apply our side of `conflicts` over whatever the sheet now holds (Keep Mine)."""
+    ops = []
+    for c in conflicts:
+        if c["op"] == "put":
+            ops.append({"op": "put", "columns": c["columns"], "rows": [c["row"]], "base": [c["remote"]]})
+        elif c["remote"] is not None:
+            ops.append({"op": "delete", "ids": [c["id"]], "base": [c["remote"]]})
+    return ops
+
+def apply_ops(frame, ops):
+    """Replays planned operations on a sheet-values frame indexed by Job_ID, e.g. to merge queued edits into a
+    fresh read. Archive appends touch another worksheet and are skipped."""
+    frame = frame.copy()
+    for op in ops:
+        if op["op"] == "rewrite":
+            frame = pd.DataFrame(op["values"], columns=op["columns"])
+            frame.index = frame[ID_COL].tolist()
+        elif op["op"] == "delete":
+            frame = frame.drop(op["ids"], errors="ignore")
+        elif op["op"] == "put":
+            rows = pd.DataFrame(op["rows"], columns=op["columns"])
+            rows.index = rows[ID_COL].tolist()
+            rows = rows[~rows.index.duplicated(keep="last")]
+            old = rows.index.isin(frame.index)
+            frame.loc[rows.index[old], rows.columns] = rows[old].values
+            frame = pd.concat([frame, rows[~old].reindex(columns=frame.columns, fill_value="")])
+    return frame
+
+def remote_stamp(ws):
+    """Cheap change marker for the spreadsheet (Drive modifiedTime, one small request); None if the client has none."""
+    get = getattr(ws.spreadsheet, "get_lastUpdateTime", None) if ws is not None else None
+    return get() if get else None
@@ -0,0 +1,47 @@
+import pandas as pd
+from job_io import map_columns, normalize_phones, validate
+
+def _problems(problems):
+    return sorted(zip(problems["Row"], problems["Column"], problems["Problem"]))
+
+def test_map_columns_by_name_and_alias():
+    raw = pd.DataFrame(columns=["Customer", "Cell", "work required", "DATE RECEIVED", "Colour", "client"])
+    mapped, mapping, unmatched = map_columns(raw)
+    assert mapping == {"Customer": "Client_Name", "Cell": "Client_Contact", "work required": "Service_Type", "DATE RECEIVED": "Date_Received"}
+    assert list(mapped.columns) == ["Client_Name", "Client_Contact", "Service_Type", "Date_Received"]
+    assert unmatched == ["Colour", "client"]  # a second source for Client_Name is left out
+
+def test_normalize_phones():
+    typed = pd.Series(["082 123 4567", "+27 82 123 4567", "27821234567", "821234567", "+44 20 7946 0958", "call me", ""])
+    phones, wrong = normalize_phones(typed)
+    assert phones.tolist() == ["0821234567"] * 4 + ["+442079460958", "call me", ""]
+    assert wrong.tolist() == [False] * 5 + [True, False]
+
+def test_validate_dates_day_first_unless_told():
+    mapped = pd.DataFrame({"Client_Name": ["A", "B"], "Category": ["Cable Faults"] * 2, "Date": ["03/04/2024", "2024-05-06"]})
+    jobs, problems = validate(mapped)
+    assert problems.empty
+    assert jobs["Date"].tolist() == [pd.Timestamp("2024-04-03"), pd.Timestamp("2024-05-06")]
+    jobs, _ = validate(mapped, dayfirst=False)
+    assert jobs["Date"].tolist() == [pd.Timestamp("2024-03-04"), pd.Timestamp("2024-05-06")]
+
+def test_validate_reports_problems_by_source_row():
+    mapped = pd.DataFrame({
+        "Client_Name": ["Eskom", "", "Sasol", "Spar", "Mondi", ""],
+        "Client_Contact": ["0821234567", "", "none", "", "", ""],
+        "Category": ["cable faults", "Cable Faults", "", "Plumbing", "Transformer Servicing", ""],
+        "Service_Type": ["jointing", "", "Order", "", "Jointing", ""],
+        "Completed": ["yes", "", "maybe", "", "", ""],
+        "Date": ["", "", "", "", "31/02/2024", ""],
+    })
+    jobs, problems = validate(mapped, default_category="Sales & Install")
+    assert _problems(problems) == [
+        (3, "Client_Name", "no client name"),
+        (4, "Client_Contact", "not a phone number"),
+        (4, "Completed", "not yes/no"),
+        (5, "Category", "unknown category"),
+        (6, "Date", "not a date"),
+        (6, "Service_Type", "not a Transformer Servicing service"),
+    ]
+    # The blank last row is skipped; the valid one is normalized, spelled as CATEGORIES spells it
+    assert jobs[["Client_Name", "Category", "Service_Type", "Completed"]].values.tolist() == [["Eskom", "Cable Faults", "Jointing", True]]
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from benchmarks.stub_sheets import StubConnection
+from benchmarks.synthetic import make_jobs
+from job_store import JobStore
+from kpis import row_facts, tally
+from schema import DATE_COLS, concat
+from search_index import SearchIndex
+from write_queue import WriteQueue
+
+FIELDS = {"client": ["Client_Name"], "contact": ["Client_Contact"], "notes": ["Notes"], "tech": ["Technician"], "date": DATE_COLS}
+
+@pytest.fixture
+def conn():
+    return StubConnection({"Sheet1": make_jobs(300)})
+
+@pytest.fixture
+def store(conn, tmp_path):
+    """A loaded store with its search index built, writing through its own journal."""
+    store = JobStore(conn, WriteQueue(str(tmp_path / "journal.db"), conn), search_fields=FIELDS, archive_worksheet="Archive")
+    store.load()
+    store._builder.join()
+    return store
+
+def _other(conn, tmp_path):
+    """Another process's store on the same sheet."""
+    other = JobStore(conn, WriteQueue(str(tmp_path / "other.db"), conn))
+    other.load()
+    return other
+
+def _edit(store, seed):
+    """A few commits of every kind: edits, a bulk edit, deletes and adds."""
+    labels = store.df.index
+    store.commit({labels[seed]: {"Client_Name": f"Renamed {seed}", "Notes": "new gasket 0821234567"}, labels[seed + 1]: {"Technician": "Nomsa"}})
+    store.commit(bulk=[(list(labels[seed + 2:seed + 6]), {"Notes": "bulk note", "Completed": True})])
+    store.commit(deleted=[labels[seed + 6], labels[seed + 7]])
+    store.commit(added=[{"Client_Name": f"New Client {seed}", "Category": "Cable Faults", "Notes": "jointing kiosk"}])
+
+def test_index_kept_by_commits_and_reloads_equals_a_fresh_build(conn, store, tmp_path):
+    _edit(store, 10)
+    other = _other(conn, tmp_path)
+    _edit(other, 40)
+    assert other.queue.drain(timeout=30) and store.queue.drain(timeout=30)
+    _edit(store, 70)  # still pending when the reload replays them
+    index = store._index
+    store.load()
+
+    fresh = SearchIndex.build(store.synced, FIELDS)
+    assert store._index is index  # carried over, not rebuilt
+    assert index._postings == fresh._postings
+    assert index._vocab == fresh._vocab and index._labels == fresh._labels
+    assert store.search("renamed 40") == set(store.df.index[store.df["Client_Name"] == "Renamed 40"])
+
+def _same_totals(kept, full):
+    assert kept.keys() == full.keys()
+    for name in full:
+        pd.testing.assert_frame_equal(kept[name].sort_index(), full[name].sort_index(), check_dtype=False, check_exact=False, obj=name)
+
+def test_kpis_kept_by_commits_archive_and_reloads_equal_a_full_tally(conn, store, tmp_path):
+    store.kpis(archived=True)  # tallied now, then kept
+    _edit(store, 10)
+    moved = store.archive_closed(pd.Timestamp.now() + pd.Timedelta(days=1))
+    assert moved and store.queue.drain(timeout=30)
+    other = _other(conn, tmp_path)
+    _edit(other, 40)
+    assert other.queue.drain(timeout=30)
+    store.load()
+    _edit(store, 70)
+
+    _same_totals(store.kpis(), tally(row_facts(store.df)))
+    _same_totals(store.kpis(archived=True), tally(row_facts(concat([store.df, store.archive()]))))
@@ -0,0 +1,9 @@
+import pandas as pd
+from schema import new_ids
+
+def test_new_ids_never_read_as_numbers():
+    ids = pd.Series(new_ids(20000))
+    assert ids.is_unique
+    # What Sheets would turn into a number when the cell is sent USER_ENTERED
+    assert pd.to_numeric(ids, errors="coerce").isna().all()
+    assert not ids.str.fullmatch(r"[\d.eE+-]+").any()
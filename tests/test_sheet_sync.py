@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+from benchmarks.stub_sheets import StubConnection, StubWorksheet
+from benchmarks.synthetic import make_jobs
+from schema import ID_COL, VERSION_COL, normalize
+from sheet_sync import open_worksheet, to_sheet_values, compute_delta, plan_changes, send_ops
+
+@pytest.fixture
+def conn(monkeypatch):
+    """A 200-job stub sheet that records the row payloads sent to it in `conn.sent`."""
+    conn = StubConnection({"Sheet1": make_jobs(200)})
+    conn.sent = {"updated": [], "appended": []}
+    batch_update, append_rows = StubWorksheet.batch_update, StubWorksheet.append_rows
+
+    def record_update(self, data, **kwargs):
+        conn.sent["updated"] += [row for d in data for row in d["values"]]
+        return batch_update(self, data, **kwargs)
+
+    def record_append(self, values, **kwargs):
+        conn.sent["appended"] += values
+        return append_rows(self, values, **kwargs)
+
+    monkeypatch.setattr(StubWorksheet, "batch_update", record_update)
+    monkeypatch.setattr(StubWorksheet, "append_rows", record_append)
+    return conn
+
+def _synced(conn):
+    df = normalize(conn.read(worksheet="Sheet1"))
+    df.index = df[ID_COL].tolist()
+    return to_sheet_values(df)
+
+def _save(conn, synced, current, dirty, step=1):
+    """Plans and sends the changes of `current` (the dirty rows still present) as JobStore.commit would,
+    each saved row's Version moved on by `step`."""
+    current = current.copy()
+    current[VERSION_COL] = (synced[VERSION_COL].reindex(current.index).fillna("0").astype(int) + step).astype(str)
+    ops, _ = plan_changes(synced, current, compute_delta(synced, current, dirty))
+    return send_ops(conn, open_worksheet(conn, "Sheet1"), "Sheet1", ops)
+
+def test_one_row_edit_sends_one_row(conn):
+    synced = _synced(conn)
+    label = synced.index[17]
+    current = synced.loc[[label]].copy()
+    current.loc[label, "Notes"] = "gasket replaced"
+
+    assert _save(conn, synced, current, [label]) == []
+    assert len(conn.sent["updated"]) == 1 and conn.sent["appended"] == []
+    assert "update" not in conn.calls  # no whole-worksheet rewrite
+    after = _synced(conn)
+    assert after.loc[label, "Notes"] == "gasket replaced"
+    assert after.drop(index=label).equals(synced.drop(index=label))
+
+def test_add_and_delete_send_only_those_rows(conn):
+    synced = _synced(conn)
+    gone = synced.index[[3, 4, 120]]
+    new = synced.iloc[[0]].rename(index={synced.index[0]: "newjob000001"}).assign(Job_ID="newjob000001", Client_Name="New Client")
+
+    assert _save(conn, synced, new, [*gone, "newjob000001"]) == []
+    assert conn.sent["updated"] == [] and len(conn.sent["appended"]) == 1
+    assert conn.calls["spreadsheet.batch_update"] == 1  # the three deletions in one request
+    after = _synced(conn)
+    assert len(after) == len(synced) - 2
+    assert not after.index.isin(gone).any() and after.loc["newjob000001", "Client_Name"] == "New Client"
+
+def test_stale_edit_is_held_back_as_conflict(conn):
+    synced = _synced(conn)
+    label = synced.index[5]
+    theirs = synced.loc[[label]].assign(Notes="changed on the sheet")
+    assert _save(conn, synced, theirs, [label], step=2) == []
+
+    mine = synced.loc[[label]].assign(Notes="changed here")
+    conflicts = _save(conn, synced, mine, [label])
+    assert [c["id"] for c in conflicts] == [label]
+    assert _synced(conn).loc[label, "Notes"] == "changed on the sheet"
+
+def test_archive_skips_jobs_already_archived(conn):
+    synced = _synced(conn)
+    op = {"op": "archive", "worksheet": "Archive", "columns": list(synced.columns), "values": synced.iloc[:5].values.tolist()}
+    ws = open_worksheet(conn, "Sheet1")
+    send_ops(conn, ws, "Sheet1", [op])
+    # A second process moving the same jobs, plus one more
+    send_ops(conn, ws, "Sheet1", [{**op, "values": synced.iloc[:6].values.tolist()}])
+    archived = conn.sheets["Archive"].frame()
+    assert archived[ID_COL].tolist() == synced.index[:6].tolist()
+
+def test_rows_land_under_the_sheet_headers_after_a_column_is_inserted(conn):
+    synced = _synced(conn)
+    # Someone inserts a column by hand after the app read the sheet
+    grid = conn.sheets["Sheet1"].grid
+    for i, line in enumerate(grid):
+        line.insert(2, "Extra" if i == 0 else f"x{i}")
+    label = synced.index[9]
+    edited = synced.loc[[label]].assign(Notes="rewired")
+    new = synced.iloc[[0]].rename(index={synced.index[0]: "newjob000001"}).assign(Job_ID="newjob000001", Client_Name="New Client")
+
+    assert _save(conn, synced, pd.concat([edited, new]), [label, "newjob000001"]) == []
+    after = conn.sheets["Sheet1"].frame().set_index(ID_COL, drop=False)
+    assert after.loc[label, "Notes"] == "rewired" and after.loc[label, "Extra"] == "x10"
+    assert after.loc[label, "Client_Name"] == synced.loc[label, "Client_Name"]
+    assert after.loc["newjob000001", "Client_Name"] == "New Client" and pd.isna(after.loc["newjob000001", "Extra"])
+
+def test_missing_id_column_fails_the_send(conn):
+    synced = _synced(conn)
+    conn.sheets["Sheet1"].grid[0] = [c if c != ID_COL else "" for c in conn.sheets["Sheet1"].grid[0]]
+    label = synced.index[2]
+    with pytest.raises(LookupError):
+        _save(conn, synced, synced.loc[[label]].assign(Notes="lost"), [label])
+    assert conn.sent["updated"] == [] and conn.sent["appended"] == []
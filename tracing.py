@@ -0,0 +1,52 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Timing spans around the slow paths (sheet reads and writes, search, job cards, uploads, editor diffs).
+# A span is a dict {"span": name, "ms": ..., plus counts such as "rows" and "bytes"}. Spans taken while a
+# session's script runs go to that session's collector (see set_collector); the rest, e.g. from the
+# background writer, to `background`. All of them go to the "uelco.trace" log as JSON lines once
+# configure_log() has set it up.
+
+log = logging.getLogger("uelco.trace")
+log.propagate = False
+background = deque(maxlen=100)  # most recent spans taken outside a script run
+_collector = None
+_lock = threading.Lock()
+
+def set_collector(fn):
+    """`fn()` returns the list that receives the current thread's spans, or None outside a script run."""
+    global _collector
+    _collector = fn
+
+def configure_log(path, max_bytes=5 * 1024 * 1024, backups=3):
+    """Writes every span to `path` as one JSON object per line, rotated at `max_bytes` keeping `backups` old files."""
+    with _lock:
+        if any(getattr(h, "baseFilename", None) for h in log.handlers): return
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+
+def record(rec):
+    spans = _collector() if _collector else None
+    (background if spans is None else spans).append(rec)
+    if log.handlers: log.info(json.dumps(rec, default=str))
+
+@contextmanager
+def span(name, **fields):
+    """Times the block as span `name`. Yields the span dict, so counts known only inside can be added to it."""
+    rec = {"ts": round(time.time(), 3), "span": name, **fields}
+    start = time.perf_counter()
+    try:
+        yield rec
+    except Exception as e:
+        rec["error"] = type(e).__name__
+        raise
+    finally:
+        rec["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        record(rec)
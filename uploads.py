@@ -0,0 +1,73 @@
+import requests
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote_from_bytes, urlencode
+from tracing import span
+
+TIMEOUT = (10, 300)  # connect, read: the Apps Script can take a while to store a large file
+CHUNK = 3 * 64 * 1024  # multiple of 3 so base64 chunks concatenate into one valid string
+
+# One pooled session for every upload, shared by the worker threads
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8))
+
+class _FormBody:
+    """urlencoded POST body whose `data` field is base64-encoded chunk by chunk while it is sent.
+
+    The file is only ever held once (by the uploader); the exact Content-Length is worked out
+    with a first encoding pass so no chunked transfer encoding is needed."""
+
+    def __init__(self, fields, file_obj, on_bytes=None):
+        self.head = (urlencode(fields) + "&data=").encode()
+        self.file_obj, self.on_bytes = file_obj, on_bytes
+        self._len = len(self.head)
+        for chunk in self._chunks():
+            b = b64encode(chunk)
+            self._len += len(b) + 2 * (b.count(b"+") + b.count(b"/") + b.count(b"="))
+
+    def _chunks(self):
+        self.file_obj.seek(0)
+        while chunk := self.file_obj.read(CHUNK):
+            yield chunk
+
+    def __len__(self): return self._len
+
+    def __iter__(self):
+        yield self.head
+        for chunk in self._chunks():
+            yield quote_from_bytes(b64encode(chunk), safe="").encode()
+            if self.on_bytes: self.on_bytes(len(chunk))
+
+def upload_to_drive(url, file_obj, filename, on_bytes=None):
+    """Streams one file to the Apps Script uploader; returns its Drive link or None."""
+    if "script.google.com" not in url: return None
+    with span("upload") as trace:
+        try:
+            body = _FormBody({'filename': filename, 'mimetype': file_obj.type}, file_obj, on_bytes)
+            trace["bytes"] = len(body)
+            resp = SESSION.post(url, data=body, headers={"Content-Type": "application/x-www-form-urlencoded"}, timeout=TIMEOUT)
+            result = resp.json() if resp.status_code == 200 else {}
+            trace["ok"] = result.get('result') == 'success'
+            return result.get('link') if trace["ok"] else None
+        except:
+            trace["ok"] = False
+            return None
+
+def upload_files(url, files, names, progress=None, workers=4):
+    """Uploads several files concurrently; returns their links (None for failures) in input order.
+
+    `progress(sent_bytes, total_bytes)` is called from the calling thread while the uploads run."""
+    sent = [0] * len(files)
+    total = sum(f.size for f in files)
+
+    def counter(i):
+        def on_bytes(n): sent[i] += n
+        return on_bytes
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(upload_to_drive, url, f, name, counter(i)) for i, (f, name) in enumerate(zip(files, names))]
+        while wait(futures, timeout=0.25).not_done:
+            if progress: progress(sum(sent), total)
+    if progress: progress(total, total)
+    return [f.result() for f in futures]
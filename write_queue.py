@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from sheet_sync import open_worksheet, coalesce, send_ops, force_ops, remote_stamp
+from tracing import span
+
+class WriteQueue:
+    """Durable journal of planned sheet operations, flushed by a background thread.
+
+    Every save appends its operations as one entry and returns straight away. The worker sends
+    pending entries in coalesced batches and deletes them only once the sheet accepted them, so a
+    failed or interrupted flush is retried with exponential backoff instead of losing the edit
+    (delivery is at-least-once; resent rows are recognised by their Version).
+
+    Rows changed on the sheet since they were read are not overwritten: they are set aside as
+    conflicts (kept in the journal too) until the app resolves them, while everything else flushes."""
+
+    def __init__(self, path, conn, worksheet="Sheet1", batch_size=50, base_delay=2.0, max_delay=300.0):
+        self.path, self.conn, self.worksheet = path, conn, worksheet
+        self.batch_size, self.base_delay, self.max_delay = batch_size, base_delay, max_delay
+        self.stamp = None             # sheet stamp after a load or our own last write
+        self.remote_changed = False   # someone else wrote to the sheet since; the app should merge it in
+        self.failures, self.last_error = 0, None
+        self._ws = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        with self._db() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS ops (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, body TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS conflicts (job_id TEXT PRIMARY KEY, body TEXT)")
+        threading.Thread(target=self._run, name="sheet-writer", daemon=True).start()
+        self._wake.set()  # flush whatever a previous process left behind
+
+    def _db(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    # --- APP SIDE ---
+
+    def put(self, ops):
+        if not ops: return
+        body = json.dumps(ops)
+        with self._lock, self._db() as db, span("journal.put", rows=len(ops), bytes=len(body)):
+            db.execute("INSERT INTO ops (created, body) VALUES (?, ?)", (time.time(), body))
+        self._wake.set()
+
+    def pending(self):
+        with self._db() as db:
+            return db.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+
+    def entries(self):
+        """All pending operations in journal order."""
+        with self._db() as db:
+            return [op for (body,) in db.execute("SELECT body FROM ops ORDER BY id") for op in json.loads(body)]
+
+    def rebase(self, stamp):
+        """Records the stamp of a fresh read."""
+        self.stamp, self.remote_changed = stamp, False
+
+    @property
+    def conflict(self):
+        """Number of rows held back as conflicts."""
+        with self._db() as db:
+            return db.execute("SELECT COUNT(*) FROM conflicts").fetchone()[0]
+
+    def conflicts(self):
+        """Rows held back because they changed on the sheet too (see sheet_sync.place_ops)."""
+        with self._db() as db:
+            return [json.loads(body) for (body,) in db.execute("SELECT body FROM conflicts ORDER BY rowid")]
+
+    def resolve(self, keep_mine, ids=None):
+        """Settles conflicts (all, or those of `ids`): keep_mine re-queues our side over the sheet's, otherwise it is dropped."""
+        found = [c for c in self.conflicts() if ids is None or c["id"] in ids]
+        with self._lock, self._db() as db:
+            db.executemany("DELETE FROM conflicts WHERE job_id = ?", [(c["id"],) for c in found])
+        if keep_mine: self.put(force_ops(found))
+
+    def flush_now(self):
+        self.failures = 0
+        self._wake.set()
+
+    def drain(self, timeout=None):
+        """Flushes now and waits until the journal is empty, for scripts that exit after saving. False on timeout."""
+        self.flush_now()
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if end is not None and time.monotonic() > end: return False
+            time.sleep(0.5)
+        return True
+
+    # --- WORKER SIDE ---
+
+    def _run(self):
+        while True:
+            delay = min(self.base_delay * 2 ** (self.failures - 1), self.max_delay) if self.failures else None
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                self._flush()
+                self.failures, self.last_error = 0, None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+
+    def _flush(self):
+        while True:
+            with self._db() as db:
+                rows = db.execute("SELECT id, body FROM ops ORDER BY id LIMIT ?", (self.batch_size,)).fetchall()
+            if not rows: return
+            if self._ws is None: self._ws = open_worksheet(self.conn, self.worksheet)
+            if self.stamp is not None and remote_stamp(self._ws) != self.stamp:
+                self.remote_changed = True
+            ops = coalesce([op for _, body in rows for op in json.loads(body)])
+            with span("sheet.write", rows=sum(len(op.get("rows") or op.get("values") or op.get("ids") or ()) for op in ops), bytes=sum(len(body) for _, body in rows)) as trace:
+                try:
+                    conflicts = send_ops(self.conn, self._ws, self.worksheet, ops)
+                except LookupError:
+                    # Job_ID or Version gone from the sheet's header: a reload restores them (as a rewrite that
+                    # supersedes this batch), until then the batch is retried with backoff
+                    self.remote_changed = True
+                    raise
+                trace["conflicts"] = len(conflicts)
+            with self._lock, self._db() as db:
+                db.execute("DELETE FROM ops WHERE id <= ?", (rows[-1][0],))
+                db.executemany("INSERT OR REPLACE INTO conflicts (job_id, body) VALUES (?, ?)", [(c["id"], json.dumps(c)) for c in conflicts])
+            self.stamp = remote_stamp(self._ws)